@@ -0,0 +1,340 @@
+"""Benchmarks de los caminos críticos del motor y del renderizado.
+
+Uso:
+    python benchmarks/bench.py run [--out benchmarks/baseline.json]
+    python benchmarks/bench.py compare [benchmarks/baseline.json] [--threshold 0.15]
+
+`run` mide operaciones por segundo y memoria transitoria por operación de cada
+benchmark y guarda el resultado en JSON. Cada benchmark se repite REPEATS veces
+de MIN_TIME segundos con el recolector de basura desactivado y se compara la
+mediana; la dispersión entre repeticiones se guarda junto a ella. `compare`
+vuelve a medir y termina con código 1 si algún benchmark pierde más de su margen
+de ops/s frente a la línea base (`threshold`, o el de THRESHOLDS para los
+benchmarks ruidosos) en 1 + RETRIES mediciones seguidas, o si su memoria por
+operación crece más de `threshold`. Si la pérdida viene con una dispersión
+(de la medida o de la línea base) mayor que el propio margen, el resultado es
+inconcluso: no cuenta como regresión, pero tampoco como aprobado, y termina con
+código 2.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from tetris_game import TetrisGame, BOARD_WIDTH, BOARD_HEIGHT  # noqa: E402
+from simulate import run_game  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REPEATS = 11
+MIN_TIME = 0.5
+# Margen propio de los benchmarks ruidosos: partidas enteras (dependen del GC y de la
+# longitud de cada partida), zlib y la construcción de cientos de controles Flet
+THRESHOLDS = {
+    'scripted_game': 0.25,
+    'bot_placement': 0.25,
+    'render_image': 0.25,
+    'build_containers': 0.3,
+    'build_canvas': 0.3,
+    'build_image': 0.3,
+}
+# Mediciones extra de un benchmark que parece haber empeorado antes de darlo por regresión
+RETRIES = 2
+# Margen absoluto para no fallar por ruido en operaciones que apenas reservan memoria
+ALLOC_TOLERANCE_BYTES = 64
+
+
+def midgame(seed: int = 7) -> TetrisGame:
+    game = TetrisGame(seed)
+    rng = random.Random(seed)
+    while game.pieces < 25 and not game.game_over:
+        for _ in range(rng.randrange(3)):
+            game.rotate_piece()
+        game.move_piece(rng.choice((-1, 1)) * rng.randrange(4), 0)
+        game.hard_drop()
+    if game.game_over:
+        game.reset_board()
+    return game
+
+
+def almost_full(game: TetrisGame) -> TetrisGame:
+    # Cuatro filas llenas salvo la columna 0 y una I vertical ya en su fila de aterrizaje:
+    # lock_piece (o hard_drop) limpia 4 líneas
+    game.board.reset()
+    for y in range(BOARD_HEIGHT - 4, BOARD_HEIGHT):
+        for x in range(1, BOARD_WIDTH):
+            game.board.place((1,), x, y, 1)
+    piece = game.current_piece
+    piece.type = 'I'
+    piece.rotation = 1
+    piece.x = 0
+    piece.y = BOARD_HEIGHT - 4
+    return game
+
+
+def bench_is_valid_position():
+    game = midgame()
+    piece = game.current_piece
+    return lambda: game.is_valid_position(piece, 1, 1)
+
+
+def bench_move_piece():
+    game = midgame()
+
+    def op():
+        if not game.move_piece(1, 0):
+            game.current_piece.x = 0
+
+    return op
+
+
+def bench_rotate_piece():
+    game = midgame()
+    return game.rotate_piece
+
+
+def bench_hard_drop():
+    game = midgame()
+
+    def op():
+        if game.game_over or game.pieces > 40:
+            game.reset_board()
+            game.pieces = 0
+        game.hard_drop()
+
+    return op
+
+
+def bench_lock_clear():
+    game = TetrisGame(3)
+
+    def op():
+        almost_full(game).lock_piece()
+
+    lines = game.lines_cleared
+    op()
+    if game.lines_cleared - lines != 4:
+        raise RuntimeError("lock_piece_clear_lines no limpia 4 líneas")
+    return op
+
+
+def bench_scripted_game():
+    seeds = itertools.cycle(range(100))
+    return lambda: run_game(next(seeds), 'random')
+
+
+def bench_snapshot():
+    game = almost_full(midgame())
+    return game.snapshot
+
+
+def bench_restore():
+    data = almost_full(midgame()).snapshot()
+    return lambda: TetrisGame.from_snapshot(data)
+
+
+def bench_bot_placement():
+    from bot import BotPolicy, best_placement
+
+    # Tablero de una partida del bot tras 40 piezas: pieza actual con lookahead
+    game = TetrisGame(11)
+    policy = BotPolicy(11)
+    while game.pieces < 40:
+        for action in policy(game):
+            game.apply_input(action)
+    return lambda: best_placement(game)
+
+
+def bench_render(name: str):
+    from renderers import RENDERERS
+
+    game = midgame()
+    renderer = RENDERERS[name]()
+    moves = ((1, 0), (-1, 0), (0, 1))
+    state = {'i': 0}
+
+    def op():
+        state['i'] += 1
+        dx, dy = moves[state['i'] % 3]
+        if not game.move_piece(dx, dy):
+            game.drop_piece()
+            if game.game_over:
+                game.reset_board()
+        renderer.render(game)
+
+    return op
+
+
+def bench_render_build(name: str):
+    from renderers import RENDERERS
+
+    return lambda: RENDERERS[name]()
+
+
+BENCHMARKS = {
+    'is_valid_position': bench_is_valid_position,
+    'move_piece': bench_move_piece,
+    'rotate_piece': bench_rotate_piece,
+    'hard_drop': bench_hard_drop,
+    'lock_piece_clear_lines': bench_lock_clear,
+    'scripted_game': bench_scripted_game,
+    'snapshot': bench_snapshot,
+    'restore_snapshot': bench_restore,
+    'bot_placement': bench_bot_placement,
+}
+
+try:
+    import flet  # noqa: F401
+except ImportError:
+    print("flet no está instalado: se omiten los benchmarks de renderizado", file=sys.stderr)
+else:
+    for _name in ('containers', 'canvas', 'image'):
+        BENCHMARKS[f'render_{_name}'] = lambda name=_name: bench_render(name)
+        BENCHMARKS[f'build_{_name}'] = lambda name=_name: bench_render_build(name)
+
+
+def measure(factory, min_time: float = MIN_TIME, repeats: int = REPEATS) -> dict:
+    op = factory()
+    # Sin GC durante la medida: una recolección a mitad de repetición no es del código medido
+    gc.collect()
+    gc.disable()
+    try:
+        # Calibra el número de iteraciones para que cada repetición dure min_time
+        n = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(n):
+                op()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / 4:
+                break
+            n *= 4
+        n = max(1, int(n * min_time / elapsed))
+
+        rates = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(n):
+                op()
+            rates.append(n / (time.perf_counter() - start))
+    finally:
+        gc.enable()
+    rates.sort()
+    median = rates[len(rates) // 2]
+
+    samples = min(n, 2000)
+    return {
+        'ops_per_sec': median,
+        # Rango intercuartílico relativo a la mediana
+        'spread': (rates[len(rates) * 3 // 4] - rates[len(rates) // 4]) / median,
+        'alloc_bytes_per_op': max(0.0, transient_bytes(op, samples) - transient_bytes(_noop, samples)),
+    }
+
+
+def _noop():
+    pass
+
+
+def transient_bytes(op, samples: int) -> float:
+    # Pico de memoria reservada durante cada llamada, medido con tracemalloc
+    tracemalloc.start()
+    transient = 0
+    for _ in range(samples):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        op()
+        transient += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return transient / samples
+
+
+def run_all(selected=None) -> dict:
+    results = {}
+    for name, factory in BENCHMARKS.items():
+        if selected and name not in selected:
+            continue
+        results[name] = measure(factory)
+        r = results[name]
+        print(
+            f"{name:<26}{r['ops_per_sec']:>14,.0f} ops/s{r['spread']:>8.1%}"
+            f"{r['alloc_bytes_per_op']:>12.0f} B/op"
+        )
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del motor y del renderizado")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run')
+    run_parser.add_argument('--out', default=DEFAULT_BASELINE)
+    run_parser.add_argument('--only', nargs='*')
+    compare_parser = sub.add_parser('compare')
+    compare_parser.add_argument('baseline', nargs='?', default=DEFAULT_BASELINE)
+    compare_parser.add_argument('--threshold', type=float, default=0.15)
+    compare_parser.add_argument('--only', nargs='*')
+    args = parser.parse_args(argv)
+
+    results = run_all(args.only)
+
+    if args.command == 'run':
+        with open(args.out, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"Línea base guardada en {args.out}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    failures = []
+    inconclusive = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        # La dispersión nunca ensancha el margen: solo decide si una pérdida es fiable
+        threshold = max(args.threshold, THRESHOLDS.get(name, 0.0))
+        best = current
+        for _ in range(RETRIES):
+            if best['ops_per_sec'] / base['ops_per_sec'] - 1 >= -threshold:
+                break
+            # Un bajón puntual de la máquina no se repite en todas las mediciones
+            retry = measure(BENCHMARKS[name])
+            if retry['ops_per_sec'] > best['ops_per_sec']:
+                best = retry
+        change = best['ops_per_sec'] / base['ops_per_sec'] - 1
+        # Líneas base antiguas no guardan la dispersión
+        spread = max(best['spread'], base.get('spread', 0.0))
+        print(f"{name:<26}{change:>+8.1%} ops/s (margen {threshold:.0%}, dispersión {spread:.0%})")
+        if change < -threshold:
+            if spread > threshold:
+                inconclusive.append(f"{name}: {change:+.1%} ops/s con {spread:.0%} de dispersión")
+            else:
+                failures.append(f"{name}: {change:+.1%} ops/s")
+        alloc_limit = base['alloc_bytes_per_op'] * (1 + args.threshold) + ALLOC_TOLERANCE_BYTES
+        if current['alloc_bytes_per_op'] > alloc_limit:
+            failures.append(
+                f"{name}: {base['alloc_bytes_per_op']:.0f} -> {current['alloc_bytes_per_op']:.0f} B/op"
+            )
+
+    if inconclusive:
+        print("INCONCLUSOS (máquina ruidosa, repetir en una máquina tranquila):\n  " + "\n  ".join(inconclusive))
+    if failures:
+        print("REGRESIONES:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    if inconclusive:
+        sys.exit(2)
+    print("Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
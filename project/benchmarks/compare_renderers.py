@@ -0,0 +1,87 @@
+"""Compara los backends de renderers.py sobre una partida guionizada.
+
+Uso: python benchmarks/compare_renderers.py [--frames 2000] [--seed 1]
+
+Para cada backend informa el número de controles del tablero, el tamaño
+estimado del mensaje de actualización por frame (JSON de las propiedades
+modificadas, como las envía page.update()) y el CPU del servidor por frame.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from tetris_game import TetrisGame  # noqa: E402
+from renderers import RENDERERS  # noqa: E402
+
+MOVES = ["left", "right", "rotate", "down", "gravity", "gravity", "gravity", "drop"]
+
+
+def count_controls(control) -> int:
+    return 1 + sum(count_controls(child) for child in control._get_children())
+
+
+def payload_size(updates) -> int:
+    props = [{"i": f"_{id(control)}", attr: value} for control, attr, value in updates]
+    return len(json.dumps(props, separators=(",", ":")))
+
+
+def play(game: TetrisGame, rng: random.Random):
+    move = rng.choice(MOVES)
+    if game.game_over:
+        game.reset_board()
+    elif move == "left":
+        game.move_piece(-1, 0)
+    elif move == "right":
+        game.move_piece(1, 0)
+    elif move == "rotate":
+        game.rotate_piece()
+    elif move == "down":
+        game.move_piece(0, 1)
+    elif move == "drop":
+        game.hard_drop()
+    else:
+        game.drop_piece()
+
+
+def measure(name: str, frames: int, seed: int) -> dict:
+    random.seed(seed)
+    rng = random.Random(seed)
+    game = TetrisGame()
+    renderer = RENDERERS[name]()
+    sizes = []
+    cpu = 0.0
+    for _ in range(frames):
+        play(game, rng)
+        start = time.process_time()
+        updates = renderer.render(game)
+        cpu += time.process_time() - start
+        sizes.append(payload_size(updates))
+    sizes.sort()
+    return {
+        "backend": name,
+        "controls": count_controls(renderer.control),
+        "bytes_mean": sum(sizes) / frames,
+        "bytes_p95": sizes[int(frames * 0.95)],
+        "cpu_us": cpu / frames * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'backend':<12}{'controles':>10}{'bytes/frame':>13}{'p95':>8}{'CPU us/frame':>14}")
+    for name in RENDERERS:
+        r = measure(name, args.frames, args.seed)
+        print(f"{r['backend']:<12}{r['controls']:>10}{r['bytes_mean']:>13.0f}{r['bytes_p95']:>8}{r['cpu_us']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
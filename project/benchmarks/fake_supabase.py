@@ -0,0 +1,286 @@
+"""Sustituto en memoria del cliente de Supabase para pruebas de carga.
+
+Implementa la parte de la API que usa la aplicación: auth (sign_in_with_password,
+sign_up, sign_out, get_session) con un estado por cliente de sesión, las tablas
+profiles, scores y questions y las funciones user_top_scores,
+global_top_scores y score_rank. Cada execute() y cada llamada de auth duerme
+una latencia aleatoria entre latency * (1 - jitter) y latency * (1 + jitter)
+en el hilo que la hace, como una petición HTTP real, y falla con probabilidad
+error_rate. Todo es determinista para una semilla dada, salvo el reparto entre
+hilos.
+
+Reproduce también las políticas RLS de supabase/migrations: sin sesión (el
+cliente compartido) solo se leen las preguntas, las lecturas de profiles y
+scores devuelven filas vacías y las funciones y los inserts fallan; con sesión
+solo se insertan filas propias. Un cliente de sesión creado con una clave
+explícita (la service role key) se salta RLS.
+
+install() lo deja como el cliente que devuelve supabase_client.get_client() y
+como fábrica de create_session_client() (los módulos que ya la importaron por
+nombre hay que parchearlos aparte).
+"""
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+QUESTIONS = [
+    {
+        "id": i,
+        "question": f"Pregunta de prueba {i}",
+        "option_a": "Uno",
+        "option_b": "Dos",
+        "option_c": "Tres",
+        "option_d": "Cuatro",
+        "correct_answer": "ABCD"[i % 4],
+    }
+    for i in range(40)
+]
+
+
+class FakeSupabaseError(Exception):
+    # code imita el de postgrest.APIError (SQLSTATE o PGRSTxxx); None en fallos de red
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeUser:
+    __slots__ = ('id', 'email')
+
+    def __init__(self, id: str, email: str):
+        self.id = id
+        self.email = email
+
+
+class FakeResponse:
+    __slots__ = ('data', 'user')
+
+    def __init__(self, data=None, user=None):
+        self.data = data
+        self.user = user
+
+
+class FakeAuth:
+    # Estado de auth de un cliente: cada cliente de sesión tiene el suyo
+    def __init__(self, db: "FakeSupabase", service: bool = False):
+        self.db = db
+        self.user = None
+        self.service = service
+
+    @property
+    def role(self) -> str:
+        if self.service:
+            return "service_role"
+        return "authenticated" if self.user else "anon"
+
+    def sign_in_with_password(self, credentials: dict) -> FakeResponse:
+        self.db.request("auth.sign_in")
+        with self.db.lock:
+            user = self.db.users.get(credentials["email"])
+        if user is None or user[1] != credentials["password"]:
+            raise FakeSupabaseError("Invalid login credentials")
+        self.user = user[0]
+        return FakeResponse(user=self.user)
+
+    def sign_up(self, credentials: dict) -> FakeResponse:
+        self.db.request("auth.sign_up")
+        self.user = self.db.add_user(credentials["email"], credentials["password"])
+        return FakeResponse(user=self.user)
+
+    def sign_out(self, options: Optional[dict] = None):
+        self.db.request("auth.sign_out")
+        self.user = None
+
+    def get_session(self):
+        return self.user
+
+
+class FakeQuery:
+    # Solo guarda lo que la aplicación usa; los demás filtros se aceptan y se ignoran
+    def __init__(self, db: "FakeSupabase", auth: FakeAuth, table: str):
+        self.db = db
+        self.auth = auth
+        self.table = table
+        self.filters = {}
+        self.rows = None
+        self.one = False
+
+    def select(self, *columns):
+        return self
+
+    def eq(self, column: str, value):
+        self.filters[column] = value
+        return self
+
+    def single(self):
+        self.one = True
+        return self
+
+    def insert(self, rows):
+        self.rows = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def range(self, start: int, end: int):
+        return self
+
+    def execute(self) -> FakeResponse:
+        self.db.request(f"{self.table}.{'insert' if self.rows is not None else 'select'}")
+        return FakeResponse(self.db.run_table(self))
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", auth: FakeAuth, name: str, params: dict):
+        self.db = db
+        self.auth = auth
+        self.name = name
+        self.params = params
+
+    def execute(self) -> FakeResponse:
+        self.db.request(f"rpc.{self.name}")
+        if self.auth.role == "anon":
+            # Las funciones solo se conceden a authenticated
+            raise FakeSupabaseError(f"permission denied for function {self.name}", "42501")
+        return FakeResponse(self.db.run_rpc(self.name, self.params))
+
+
+class FakeSessionClient:
+    # Lo que devuelve create_session_client(): auth propia sobre los mismos datos
+    def __init__(self, db: "FakeSupabase", service: bool = False):
+        self.db = db
+        self.auth = FakeAuth(db, service)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self.db, self.auth, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self.db, self.auth, name, params)
+
+
+class FakeSupabase:
+    def __init__(self, latency: float = 0.03, jitter: float = 0.5, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.auth = FakeAuth(self)
+        self.lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self.users = {}
+        self.profiles = {}
+        self.scores = []
+        self.questions = list(QUESTIONS)
+        self.calls = {}
+        self.errors = 0
+
+    def request(self, op: str):
+        with self.lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+            delay = self.latency * (1 + self.jitter * (2 * self._rng.random() - 1))
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(max(0.0, delay))
+        if fail:
+            raise FakeSupabaseError(f"503 Service Unavailable ({op})")
+
+    def add_user(self, email: str, password: str, username: Optional[str] = None) -> FakeUser:
+        user = FakeUser(str(uuid.UUID(int=len(self.users) + 1)), email)
+        with self.lock:
+            self.users[email] = (user, password)
+            if username:
+                self.profiles[user.id] = {"id": user.id, "username": username}
+        return user
+
+    def session_client(self, key: Optional[str] = None) -> FakeSessionClient:
+        # Sin clave, la anónima; con otra clave explícita, la service role key
+        return FakeSessionClient(self, service=key is not None)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, self.auth, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self, self.auth, name, params)
+
+    def run_table(self, query: FakeQuery):
+        role = query.auth.role
+        uid = query.auth.user.id if query.auth.user else None
+        if query.table in ("profiles", "scores") and role != "service_role":
+            if query.rows is not None:
+                key = "id" if query.table == "profiles" else "user_id"
+                if role == "anon" or any(row[key] != uid for row in query.rows):
+                    raise FakeSupabaseError(
+                        f'new row violates row-level security policy for table "{query.table}"', "42501"
+                    )
+            elif role == "anon":
+                return [] if not query.one else self._single([])
+        with self.lock:
+            if query.table == "questions":
+                return list(self.questions)
+            if query.table == "profiles":
+                if query.rows is not None:
+                    for row in query.rows:
+                        self.profiles[row["id"]] = dict(row)
+                    return query.rows
+                rows = [row for row in self.profiles.values() if row["id"] == query.filters.get("id")]
+                return self._single(rows) if query.one else rows
+            if query.table == "scores":
+                if query.rows is not None:
+                    now = datetime.now(timezone.utc).isoformat()
+                    for row in query.rows:
+                        self.scores.append({"created_at": now, **row})
+                    return query.rows
+                return list(self.scores)
+        raise FakeSupabaseError(f"Tabla desconocida: {query.table}")
+
+    def _single(self, rows: List[dict]) -> dict:
+        if len(rows) != 1:
+            raise FakeSupabaseError("JSON object requested, multiple (or no) rows returned", "PGRST116")
+        return rows[0]
+
+    def _ranked(self, rows: List[dict]) -> List[dict]:
+        return sorted(rows, key=lambda row: (row["score"], row["created_at"]), reverse=True)
+
+    def run_rpc(self, name: str, params: dict):
+        with self.lock:
+            if name == "user_top_scores":
+                rows = self._ranked([row for row in self.scores if row["user_id"] == params["p_user_id"]])
+                if params.get("p_after_score") is not None:
+                    after = (params["p_after_score"], params["p_after_created_at"])
+                    rows = [row for row in rows if (row["score"], row["created_at"]) < after]
+                return [
+                    {"score": row["score"], "level": row["level"], "created_at": row["created_at"]}
+                    for row in rows[:params["p_limit"]]
+                ]
+            if name == "global_top_scores":
+                best = {}
+                for row in self.scores:
+                    if row["user_id"] not in best or row["score"] > best[row["user_id"]]["score"]:
+                        best[row["user_id"]] = row
+                return [
+                    {
+                        "username": self.profiles.get(row["user_id"], {}).get("username"),
+                        "score": row["score"],
+                        "level": row["level"],
+                        "created_at": row["created_at"],
+                    }
+                    for row in self._ranked(list(best.values()))[:params["p_limit"]]
+                ]
+            if name == "score_rank":
+                best = {}
+                for row in self.scores:
+                    best[row["user_id"]] = max(best.get(row["user_id"], 0), row["score"])
+                return 1 + sum(1 for score in best.values() if score > params["p_score"])
+        raise FakeSupabaseError(f"Función desconocida: {name}")
+
+
+def install(fake: FakeSupabase) -> FakeSupabase:
+    import supabase_client
+
+    supabase_client._client = fake
+    supabase_client.create_session_client = fake.session_client
+    return fake
@@ -0,0 +1,313 @@
+"""Clientes de Supabase por sesión: pool HTTP compartido frente a uno por cliente.
+
+Uso: python benchmarks/http_pool.py [--sessions 200] [--rtt-ms 20] [--latency-ms 5]
+     [--arrivals 50] [--play-ms 500]
+
+Levanta un servidor HTTPS local (certificado autofirmado, HTTP/1.1 keep-alive)
+que responde como Supabase a login, consulta del perfil y cierre de sesión, y
+comprueba en cada consulta que el token es el del usuario pedido: si dos
+sesiones se pisaran el estado de auth, la consulta falla. Para simular la red,
+cada conexión nueva espera 2 RTT (TCP + TLS 1.3) antes del handshake y cada
+petición 1 RTT más --latency-ms.
+
+N sesiones llegan a --arrivals por segundo, hacen login y perfil y, tras
+--play-ms de partida, otra consulta con su token (como la subida de la
+puntuación) y logout; cada paso en un pool de SUPABASE_WORKERS hilos, como
+run_db. Tres formas de crear los clientes:
+
+- `global`: como antes, un solo cliente para todos; las sesiones concurrentes
+  se pisan el token y aparecen en la columna de tokens cruzados
+- `por cliente`: un create_client() por defecto por sesión; abre sus propias
+  conexiones (una para auth y otra para PostgREST)
+- `compartido`: create_session_client() por sesión; todos comparten el pool
+  keep-alive de supabase_client
+
+Se informa de los handshakes TLS contados en el servidor (y por el contador
+de la aplicación en los modos que usan el pool), la latencia de cada petición
+y del login completo, y el CPU por sesión.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import socket
+import ssl
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+PASSWORD = "secreto"
+
+
+def self_signed(directory: str) -> tuple:
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("localhost")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        ))
+    return cert_path, key_path
+
+
+class FakeSupabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body=None):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _wait(self):
+        time.sleep(self.server.rtt + self.server.latency)
+
+    def do_POST(self):
+        self._wait()
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path == "/auth/v1/token":
+            email = json.loads(body)["email"]
+            user_id = user_id_for(email)
+            now = int(time.time())
+            self._reply(200, {
+                "access_token": f"token-{user_id}",
+                "token_type": "bearer",
+                "expires_in": 3600,
+                "expires_at": now + 3600,
+                "refresh_token": f"refresh-{user_id}",
+                "user": {
+                    "id": user_id,
+                    "aud": "authenticated",
+                    "role": "authenticated",
+                    "email": email,
+                    "app_metadata": {},
+                    "user_metadata": {},
+                    "created_at": "2026-01-01T00:00:00Z",
+                },
+            })
+        elif url.path == "/auth/v1/logout":
+            self._reply(204)
+        else:
+            self._reply(404, {"message": "not found"})
+
+    def do_GET(self):
+        self._wait()
+        url = urlparse(self.path)
+        if url.path == "/rest/v1/profiles":
+            user_id = parse_qs(url.query)["id"][0].removeprefix("eq.")
+            if self.headers.get("Authorization") != f"Bearer token-{user_id}":
+                with self.server.mismatches.get_lock():
+                    self.server.mismatches.value += 1
+                self._reply(401, {"message": "JWT de otro usuario", "code": "42501"})
+                return
+            self._reply(200, {"username": f"jugador-{user_id[:8]}"})
+        else:
+            self._reply(404, {"message": "not found"})
+
+
+class FakeSupabaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cert: str, key: str, rtt: float, latency: float, handshakes, mismatches):
+        super().__init__(("127.0.0.1", 0), FakeSupabaseHandler)
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(cert, key)
+        self.rtt = rtt
+        self.latency = latency
+        self.handshakes = handshakes
+        self.mismatches = mismatches
+
+    def finish_request(self, request, client_address):
+        # En el hilo de la conexión: TCP + TLS 1.3 cuestan dos viajes de ida y vuelta
+        time.sleep(2 * self.rtt)
+        with self.handshakes.get_lock():
+            self.handshakes.value += 1
+        # Cabeceras y cuerpo salen en dos escrituras: sin esto, Nagle y el ACK retrasado suman 40 ms
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            request = self.context.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        super().finish_request(request, client_address)
+
+
+def user_id_for(email: str) -> str:
+    return str(uuid.UUID(int=int(email.split("@")[0].removeprefix("jugador")) + 1))
+
+
+def serve(cert: str, key: str, rtt: float, latency: float, handshakes, mismatches, ready):
+    # En otro proceso: el servidor no compite por el GIL con los clientes que se miden
+    server = FakeSupabaseServer(cert, key, rtt, latency, handshakes, mismatches)
+    ready.send(server.server_port)
+    server.serve_forever()
+
+
+def run_mode(mode: str, count: int, arrivals: float, play: float, handshakes, mismatches) -> dict:
+    import supabase_client
+    from supabase import ClientOptions, create_client
+
+    emails = [f"jugador{i}@test.local" for i in range(count)]
+    requests = []
+    logins = []
+    lock = threading.Lock()
+
+    def timed(fn, *fn_args):
+        start = time.perf_counter()
+        result = fn(*fn_args)
+        with lock:
+            requests.append(time.perf_counter() - start)
+        return result
+
+    def new_client():
+        if mode == "compartido":
+            return supabase_client.create_session_client()
+        if mode == "global":
+            return supabase_client.get_client()
+        return create_client(
+            supabase_client.SUPABASE_URL, supabase_client.SUPABASE_KEY,
+            ClientOptions(auto_refresh_token=False, persist_session=False),
+        )
+
+    async def session(email: str, play: float, delay: float = 0):
+        # Cada paso en el pool, como run_db; entre medias el bucle de eventos queda libre
+        await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+
+        def call(fn, *fn_args):
+            return loop.run_in_executor(pool, timed, fn, *fn_args)
+
+        start = time.perf_counter()
+        client = await loop.run_in_executor(pool, new_client)
+        response = await call(client.auth.sign_in_with_password, {"email": email, "password": PASSWORD})
+        user_id = response.user.id
+        await call(client.table("profiles").select("username").eq("id", user_id).single().execute)
+        logins.append(time.perf_counter() - start)
+        # La partida; después, una consulta con el token del usuario, como la subida de su puntuación
+        await asyncio.sleep(play)
+        await call(client.table("profiles").select("username").eq("id", user_id).single().execute)
+        await call(client.auth.sign_out, {"scope": "local"})
+
+    async def run_all(play: float) -> int:
+        results = await asyncio.gather(
+            *(session(email, play, i / arrivals) for i, email in enumerate(emails)), return_exceptions=True,
+        )
+        return sum(1 for result in results if isinstance(result, Exception))
+
+    # Mismo número de hilos que el pool de run_db
+    pool = ThreadPoolExecutor(supabase_client.SUPABASE_WORKERS)
+    # Una sesión de calentamiento: importar el SDK y crear el pool no cuentan
+    asyncio.run(session("jugador0@test.local", 0))
+    requests.clear()
+    logins.clear()
+    handshakes_before = handshakes.value
+    mismatches_before = mismatches.value
+    app_handshakes = supabase_client.tls_context.handshakes if supabase_client.tls_context else 0
+    cpu = time.process_time()
+    start = time.perf_counter()
+    errors = asyncio.run(run_all(play))
+    pool.shutdown()
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    requests.sort()
+    logins.sort()
+    return {
+        "mode": mode,
+        "handshakes": handshakes.value - handshakes_before,
+        "app_handshakes": (supabase_client.tls_context.handshakes - app_handshakes) if supabase_client.tls_context else 0,
+        "p50": requests[len(requests) // 2],
+        "p99": requests[int(len(requests) * 0.99)],
+        "login_p50": logins[len(logins) // 2],
+        "login_p99": logins[int(len(logins) * 0.99)],
+        "cpu": cpu / len(emails),
+        "wall": wall,
+        "errors": errors,
+        "mismatches": mismatches.value - mismatches_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rtt-ms", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--arrivals", type=float, default=50, help="sesiones nuevas por segundo")
+    parser.add_argument("--play-ms", type=float, default=500, help="tiempo entre el login y la consulta final")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="tetris_pool_")
+    cert, key = self_signed(directory)
+    handshakes = multiprocessing.Value("i", 0)
+    mismatches = multiprocessing.Value("i", 0)
+    ready, port = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(cert, key, args.rtt_ms / 1000, args.latency_ms / 1000, handshakes, mismatches, ready),
+        daemon=True,
+    )
+    server.start()
+
+    # Antes de importar supabase_client: apunta al servidor local y confía en su certificado
+    os.environ["VITE_SUPABASE_URL"] = f"https://localhost:{port.recv()}"
+    os.environ["VITE_SUPABASE_ANON_KEY"] = "anon"
+    os.environ["SUPABASE_CA_FILE"] = cert
+    os.environ["SSL_CERT_FILE"] = cert
+    os.environ["METRICS_ENABLED"] = "0"
+    sys.path.insert(0, SRC)
+
+    print(
+        f"{args.sessions} sesiones (login, perfil, partida de {args.play_ms:g} ms, consulta, logout), RTT {args.rtt_ms:g} ms, "
+        f"servidor {args.latency_ms:g} ms por petición"
+    )
+    print(
+        f"{'modo':<12}{'handshakes':>11}{'petición p50':>14}{'p99':>9}{'login p50':>11}{'p99':>9}"
+        f"{'CPU/sesión':>12}{'total':>9}{'errores':>9}{'tokens cruzados':>17}"
+    )
+    for mode in ("global", "por cliente", "compartido"):
+        result = run_mode(mode, args.sessions, args.arrivals, args.play_ms / 1000, handshakes, mismatches)
+        print(
+            f"{mode:<12}{result['handshakes']:>11}{result['p50'] * 1000:>12.1f}ms{result['p99'] * 1000:>7.1f}ms"
+            f"{result['login_p50'] * 1000:>9.1f}ms{result['login_p99'] * 1000:>7.1f}ms"
+            f"{result['cpu'] * 1000:>10.2f}ms{result['wall']:>8.2f}s{result['errors']:>9}{result['mismatches']:>17}"
+        )
+        if mode != "por cliente":
+            print(f"  handshakes según tetris_db_tls_handshakes_total: {result['app_handshakes']}")
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
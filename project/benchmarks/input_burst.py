@@ -0,0 +1,108 @@
+"""Coste de una ráfaga de entradas: envío inmediato frente a un envío por frame.
+
+Uso: python benchmarks/input_burst.py [--sessions 50] [--rate 10] [--burst 3] [--duration 5]
+
+Cada sesión es un TetrisApp real en la pantalla de juego que recibe --rate
+ráfagas por segundo de --burst teclas seguidas (flechas y rotación), como al
+mantener una tecla con repetición automática mientras se pulsa otra. En el modo `inmediato` cada entrada se aplica
+y se envía en el acto, como hacían los manejadores de los botones; en el modo
+`frame` las entradas se encolan y el planificador las aplica con un solo
+render y un solo page.update() por frame. Se informa de los envíos por
+websocket, los bytes y el CPU del servidor por entrada.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import flet as ft  # noqa: E402
+
+from session_memory import SilentConnection, FakeUser  # noqa: E402
+import main as app_main  # noqa: E402
+
+KEYS = ["Arrow Left", "Arrow Right", "Arrow Up", "Arrow Down"]
+
+
+class KeyEvent:
+    __slots__ = ('key',)
+
+    def __init__(self, key: str):
+        self.key = key
+
+
+async def scenario(mode: str, count: int, rate: float, burst: int, duration: float) -> dict:
+    loop = asyncio.get_running_loop()
+    conn = SilentConnection()
+    apps = []
+    for i in range(count):
+        app = app_main.TetrisApp(ft.Page(conn, f"{mode}-{i}", loop=loop))
+        app.user = FakeUser()
+        app.start_game()
+        apps.append(app)
+
+    rng = random.Random(1)
+    sends = conn.sends
+    sent_bytes = conn.bytes
+    inputs = 0
+    cpu = time.process_time()
+    start = loop.time()
+    rounds = int(duration * rate)
+    for round_number in range(rounds):
+        for app in apps:
+            if app.timer is None:
+                # Partida terminada: empieza otra para mantener la carga
+                app.start_game()
+                continue
+            for _ in range(burst):
+                await app.page.on_keyboard_event(KeyEvent(rng.choice(KEYS)))
+                inputs += 1
+                if mode == "inmediato":
+                    app.timer.flush()
+        await asyncio.sleep(max(0.0, start + (round_number + 1) / rate - loop.time()))
+    duration = loop.time() - start
+    cpu = time.process_time() - cpu
+
+    for app in apps:
+        app.release()
+    return {
+        "mode": mode,
+        "inputs": inputs,
+        "sends": (conn.sends - sends) / duration,
+        "bytes": (conn.bytes - sent_bytes) / duration,
+        "cpu_per_input": cpu / inputs,
+    }
+
+
+async def run_all(count: int, rate: float, burst: int, duration: float) -> list:
+    return [await scenario(mode, count, rate, burst, duration) for mode in ("inmediato", "frame")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=10)
+    parser.add_argument("--burst", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    app_main.MAX_SESSIONS = max(app_main.MAX_SESSIONS, args.sessions * 2)
+    print(
+        f"{args.sessions} sesiones, {args.rate:.0f} ráfagas/s de {args.burst} teclas cada una, "
+        f"{args.duration:.0f} s"
+    )
+    print(f"{'modo':<11}{'entradas':>9}{'envíos/s':>10}{'KB/s':>8}{'CPU us/entrada':>16}")
+    # Un solo bucle de eventos: el planificador común se queda ligado al primero que lo arranca
+    results = asyncio.run(run_all(args.sessions, args.rate, args.burst, args.duration))
+    for r in results:
+        print(
+            f"{r['mode']:<11}{r['inputs']:>9}{r['sends']:>10.0f}"
+            f"{r['bytes'] / 1024:>8.1f}{r['cpu_per_input'] * 1e6:>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Retraso de los ticks de otras sesiones mientras una consulta de Supabase tarda.
+
+Uso: python benchmarks/io_jitter.py [--sessions 200] [--slow 2.0]
+
+Lanza N bucles de juego simulados (asyncio, tick de 0.08 s) en el mismo bucle
+de eventos y, en mitad de la prueba, una sesión hace una consulta que tarda
+--slow segundos. Se mide el retraso de cada tick respecto a su plazo en dos
+modos: llamada bloqueante directa en el manejador (como antes) y llamada a
+través de supabase_client.run_db.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from supabase_client import run_db  # noqa: E402
+
+TICK = 0.08
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def session(lateness, duration):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + TICK
+    end = loop.time() + duration
+    while deadline < end:
+        await asyncio.sleep(deadline - loop.time())
+        lateness.append(loop.time() - deadline)
+        deadline += TICK
+
+
+async def scenario(sessions: int, slow: float, mode: str) -> list:
+    lateness = []
+    duration = slow + 2.0
+
+    def slow_query():
+        time.sleep(slow)
+
+    async def slow_handler():
+        await asyncio.sleep(1.0)
+        if mode == 'bloqueante':
+            slow_query()
+        else:
+            await run_db(slow_query, timeout=slow + 5)
+
+    await asyncio.gather(slow_handler(), *(session(lateness, duration) for _ in range(sessions)))
+    return lateness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--slow', type=float, default=2.0)
+    args = parser.parse_args()
+
+    print(f"{'modo':<12}{'p50 ms':>9}{'p99 ms':>9}{'máx ms':>9}")
+    for mode in ('bloqueante', 'run_db'):
+        lateness = asyncio.run(scenario(args.sessions, args.slow, mode))
+        print(
+            f"{mode:<12}{percentile(lateness, 0.5) * 1000:>9.1f}"
+            f"{percentile(lateness, 0.99) * 1000:>9.1f}{max(lateness) * 1000:>9.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,377 @@
+"""Prueba de carga local: N sesiones simuladas contra un Supabase falso.
+
+Uso: python benchmarks/load_test.py [--sessions 50,100,200,400] [--duration 30]
+     [--latency-ms 30] [--error-rate 0] [--slo-ms 50]
+
+Cada paso corre en un proceso nuevo con N páginas Flet reales (las de
+session_memory.py) y el cliente de Supabase sustituido por
+benchmarks/fake_supabase.py, con la latencia y la tasa de errores indicadas.
+Cada sesión hace lo que haría un jugador, enviando los mismos eventos que el
+navegador (cambios de texto, clics y teclas): login, partida con --input-rate
+teclas por segundo (--drop-share de ellas DROP) hasta el Game Over, pregunta
+de trivia (acierta con --correct-rate), pantalla final, lista de partidas y
+vuelta a jugar. Tras el arranque escalonado (--ramp) se mide durante
+--duration segundos:
+
+- retraso de los ticks de gravedad respecto a su plazo (p50, p99, máximo)
+- latencia de cada pantalla desde el evento hasta que se envía (login, jugar,
+  trivia, partidas) y de cada DROP hasta el frame que lo envía
+- CPU del proceso frente al tiempo de pared, RSS y errores de Supabase
+
+El resultado final es el mayor N cuyo p99 de retraso de tick cumple --slo-ms:
+las sesiones que aguanta un núcleo, ya que todas las sesiones comparten un
+único bucle de eventos. Todo es determinista para una --seed dada salvo el
+reparto de tiempo entre hilos.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TMP_DIR = tempfile.mkdtemp(prefix="tetris_load_")
+# Nada de la prueba debe acabar en la cola real de puntuaciones ni en las partidas guardadas
+os.environ["SCORE_SPOOL_PATH"] = os.path.join(TMP_DIR, "score_spool.db")
+os.environ["SNAPSHOT_PATH"] = os.path.join(TMP_DIR, "snapshots.db")
+# Con clave explícita el Supabase falso da un cliente que se salta RLS, como la service role key
+os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "fake-service-role-key"
+
+import flet as ft  # noqa: E402
+from flet.core.event import Event  # noqa: E402
+
+from fake_supabase import FakeSupabase, install  # noqa: E402
+from session_memory import SilentConnection, rss_bytes  # noqa: E402
+import main as app_main  # noqa: E402
+import scheduler as scheduler_module  # noqa: E402
+from questions import question_cache  # noqa: E402
+import score_writer as score_writer_module  # noqa: E402
+from score_writer import score_writer  # noqa: E402
+from snapshots import snapshot_writer  # noqa: E402
+
+PASSWORD = "secreto"
+SCREEN_TIMEOUT = 30.0
+MOVES = ["Arrow Left", "Arrow Right", "Arrow Up"]
+
+
+class NotifyingConnection(SilentConnection):
+    # Además de contar, despierta a la sesión simulada cuando su página envía algo
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self.waiters = {}
+
+    def _notify(self, session_id):
+        event = self.waiters.get(session_id)
+        if event is not None:
+            self.loop.call_soon_threadsafe(event.set)
+
+    def send_command(self, session_id, command):
+        result = super().send_command(session_id, command)
+        self._notify(session_id)
+        return result
+
+    def send_commands(self, session_id, commands):
+        result = super().send_commands(session_id, commands)
+        self._notify(session_id)
+        return result
+
+
+class LatenessRecorder:
+    # Sustituye al histograma de scheduler.py para guardar cada valor y no solo su cubeta
+    def __init__(self):
+        self.values = []
+        self.enabled = False
+
+    def observe(self, value: float, **labels):
+        if self.enabled:
+            self.values.append(value)
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def find(page: ft.Page, match):
+    stack = list(page.controls)
+    while stack:
+        control = stack.pop()
+        if match(control):
+            return control
+        stack.extend(control._get_children())
+    return None
+
+
+def with_text(prefix: str):
+    def match(control):
+        text = getattr(control, "text", None) or getattr(control, "value", None)
+        return isinstance(text, str) and text.startswith(prefix)
+    return match
+
+
+def with_label(label: str):
+    return lambda control: getattr(control, "label", None) == label
+
+
+class SimulatedPlayer:
+    def __init__(self, index: int, page: ft.Page, conn: NotifyingConnection, args, stats: dict):
+        self.index = index
+        self.page = page
+        self.sent = asyncio.Event()
+        conn.waiters[page.session_id] = self.sent
+        self.app = None
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(args.seed * 100003 + index)
+
+    def observe(self, kind: str, value: float, always: bool = False):
+        if always or self.stats["measuring"]:
+            self.stats["latency"][kind].append(value)
+
+    async def wait_for(self, match, kind: str = None, start: float = None):
+        # Espera a que la página envíe un árbol que contenga el control buscado
+        deadline = time.perf_counter() + SCREEN_TIMEOUT
+        while True:
+            # Se limpia antes de mirar: un envío desde el hilo de un manejador no se pierde
+            self.sent.clear()
+            control = find(self.page, match)
+            if control is not None:
+                if kind:
+                    self.observe(kind, time.perf_counter() - start)
+                return control
+            try:
+                await asyncio.wait_for(self.sent.wait(), max(0.0, deadline - time.perf_counter()))
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"sesión {self.index}: pantalla no recibida") from None
+
+    async def click(self, control):
+        await self.page.on_event_async(Event(control.uid, "click", ""))
+
+    async def type_text(self, field: ft.TextField, value: str):
+        await self.page.on_event_async(Event("page", "change", json.dumps([{"i": field.uid, "value": value}])))
+
+    async def press(self, key: str):
+        data = {"key": key, "shift": False, "ctrl": False, "alt": False, "meta": False}
+        await self.page.on_event_async(Event("page", "keyboard_event", json.dumps(data)))
+
+    async def login(self):
+        await self.type_text(await self.wait_for(with_label("Correo")), f"jugador{self.index}@test.local")
+        await self.type_text(await self.wait_for(with_label("Contraseña")), PASSWORD)
+        button = await self.wait_for(with_text("Iniciar Sesión"))
+        while True:
+            # El manejador es async: al volver, el login ya terminó con el menú o con un error
+            start = time.perf_counter()
+            await self.click(button)
+            if find(self.page, with_text(" JUGAR")):
+                # Los logins caen casi todos en el arranque escalonado: se cuentan todos
+                self.observe("login", time.perf_counter() - start, always=True)
+                return
+            # Error inyectado: se vuelve a intentar, como haría el jugador
+            await asyncio.sleep(1)
+
+    async def play(self):
+        start = time.perf_counter()
+        await self.click(await self.wait_for(with_text(" JUGAR")))
+        await self.wait_for(with_text("ROTAR"), "jugar", start)
+        await self.play_until_game_over()
+
+    async def play_until_game_over(self):
+        interval = 1 / self.args.input_rate
+        while self.app.timer is not None:
+            await asyncio.sleep(interval * (0.5 + self.rng.random()))
+            if self.app.timer is None:
+                break
+            key = " " if self.rng.random() < self.args.drop_share else self.rng.choice(MOVES)
+            self.sent.clear()
+            start = time.perf_counter()
+            await self.press(key)
+            if key != " ":
+                continue
+            # DROP siempre cambia el tablero; un giro o un paso contra la pared no envía nada
+            try:
+                await asyncio.wait_for(self.sent.wait(), SCREEN_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"sesión {self.index}: entrada sin frame") from None
+            self.observe("frame", time.perf_counter() - start)
+        self.stats["games"] += 1
+
+    async def trivia(self) -> bool:
+        # Devuelve True si la partida sigue tras acertar
+        await self.wait_for(with_text("A) "))
+        question = self.app.current_question
+        correct = self.rng.random() < self.args.correct_rate
+        answer = question["correct_answer"] if correct else "ABCD"[("ABCD".index(question["correct_answer"]) + 1) % 4]
+        start = time.perf_counter()
+        await self.click(await self.wait_for(with_text(f"{answer}) ")))
+        await self.wait_for(with_text("¡Correcto" if correct else "Incorrecto"), "trivia", start)
+        return correct
+
+    async def leaderboard(self):
+        await self.click(await self.wait_for(with_text("Volver al Menú")))
+        start = time.perf_counter()
+        await self.click(await self.wait_for(with_text(" PARTIDAS")))
+        await self.wait_for(lambda c: with_text("1.")(c) or with_text("Aún no")(c) or with_text("Error")(c), "partidas", start)
+        await self.click(await self.wait_for(with_text("Volver al Menú")))
+
+    async def run(self, until: float):
+        self.app = app_main.TetrisApp(self.page)
+        await self.login()
+        await self.play()
+        while time.perf_counter() < until:
+            if await self.trivia():
+                # Tras acertar la partida sigue sola a los 2 s
+                await self.wait_for(with_text("ROTAR"))
+                await self.play_until_game_over()
+                continue
+            await self.wait_for(with_text("JUEGO TERMINADO"))
+            await self.leaderboard()
+            await self.play()
+
+
+async def delayed(player: SimulatedPlayer, delay: float, until: float):
+    await asyncio.sleep(delay)
+    await player.run(until)
+
+
+async def scenario(count: int, args, fake: FakeSupabase) -> dict:
+    loop = asyncio.get_running_loop()
+    conn = NotifyingConnection(loop)
+    # Como flet_fastapi: los manejadores síncronos van a un pool de hilos
+    executor = ThreadPoolExecutor(thread_name_prefix="flet_fastapi")
+    stats = {"measuring": False, "latency": defaultdict(list), "games": 0}
+    recorder = LatenessRecorder()
+    scheduler_module.tick_lateness_seconds = recorder
+
+    base_rss = rss_bytes()
+    start = time.perf_counter()
+    until = start + args.ramp + args.duration
+    players = []
+    tasks = []
+    for i in range(count):
+        page = ft.Page(conn, f"load-{i}", loop=loop, executor=executor)
+        player = SimulatedPlayer(i, page, conn, args, stats)
+        players.append(player)
+        # Llegadas escalonadas durante el arranque, como usuarios que entran poco a poco
+        tasks.append(loop.create_task(delayed(player, args.ramp * i / count, until)))
+
+    await asyncio.sleep(max(0.0, start + args.ramp - time.perf_counter()))
+    stats["measuring"] = recorder.enabled = True
+    stats["games"] = 0
+    errors = fake.errors
+    calls = sum(fake.calls.values())
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    stats["measuring"] = recorder.enabled = False
+    rss = rss_bytes()
+
+    failures = []
+    for task in tasks:
+        task.cancel()
+    for result in await asyncio.gather(*tasks, return_exceptions=True):
+        if isinstance(result, Exception):
+            failures.append(str(result))
+    for player in players:
+        if player.app is not None:
+            player.app.release()
+    executor.shutdown(wait=False)
+    return {
+        "sessions": count,
+        "lateness": recorder.values,
+        "latency": dict(stats["latency"]),
+        "games": stats["games"],
+        "cpu": cpu / wall,
+        "rss": rss,
+        "rss_per_session": (rss - base_rss) / count,
+        "db_calls": sum(fake.calls.values()) - calls,
+        "db_errors": fake.errors - errors,
+        "failures": failures,
+        "wall": wall,
+    }
+
+
+def run_step(count: int, args) -> dict:
+    # Cada paso en un proceso nuevo: el RSS y el planificador no arrastran el paso anterior
+    random.seed(args.seed)
+    fake = install(FakeSupabase(args.latency_ms / 1000, args.jitter, args.error_rate, args.seed))
+    app_main.create_session_client = fake.session_client
+    score_writer_module.create_session_client = fake.session_client
+    for i in range(count):
+        fake.add_user(f"jugador{i}@test.local", PASSWORD, f"jugador{i}")
+    app_main.MAX_SESSIONS = max(app_main.MAX_SESSIONS, count)
+    question_cache.load()
+    score_writer.start()
+    snapshot_writer.start()
+    return asyncio.run(scenario(count, args, fake))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", default="50,100,200,400", help="pasos de N separados por comas")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--ramp", type=float, default=10)
+    parser.add_argument("--input-rate", type=float, default=4, help="teclas por segundo y sesión")
+    # Más DROP acorta las partidas y aumenta los cambios de pantalla (los más caros)
+    parser.add_argument("--drop-share", type=float, default=0.1, help="fracción de teclas que son DROP")
+    parser.add_argument("--correct-rate", type=float, default=0.5)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    # Por debajo del intervalo de gravedad más corto (80 ms): ningún tick se solapa con el siguiente
+    parser.add_argument("--slo-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"Supabase falso: {args.latency_ms:.0f} ms ± {args.jitter:.0%}, {args.error_rate:.1%} de errores; "
+        f"{args.input_rate:g} teclas/s por sesión ({args.drop_share:.0%} DROP), "
+        f"{args.duration:g} s medidos tras {args.ramp:g} s de arranque"
+    )
+    print(
+        f"{'sesiones':>8}{'tick p50':>10}{'p99':>9}{'máx':>9}{'frame p99':>11}{'login p99':>11}"
+        f"{'jugar p99':>11}{'trivia p99':>12}{'partidas p99':>14}{'CPU':>6}{'RSS MB':>8}"
+        f"{'partidas/s':>12}{'errores':>11}{'fallos':>8}"
+    )
+    context = multiprocessing.get_context("spawn")
+    capacity = 0
+    for count in [int(n) for n in args.sessions.split(",")]:
+        with context.Pool(1) as pool:
+            result = pool.apply(run_step, (count, args))
+        latency = result["latency"]
+
+        def ms(values, fraction=0.99):
+            return f"{percentile(values, fraction) * 1000:.1f}ms"
+
+        lateness = result["lateness"]
+        late_p99 = percentile(lateness, 0.99) * 1000
+        print(
+            f"{count:>8}{ms(lateness, 0.5):>10}{ms(lateness):>9}{ms(lateness, 1):>9}"
+            f"{ms(latency.get('frame', [])):>11}{ms(latency.get('login', [])):>11}"
+            f"{ms(latency.get('jugar', [])):>11}{ms(latency.get('trivia', [])):>12}"
+            f"{ms(latency.get('partidas', [])):>14}{result['cpu']:>6.0%}{result['rss'] / 2**20:>8.0f}"
+            f"{result['games'] / result['wall']:>12.1f}{result['db_errors']:>6}/{result['db_calls']:<4}"
+            f"{len(result['failures']):>8}"
+        )
+        for failure in result["failures"][:3]:
+            print(f"  {failure}")
+        if late_p99 <= args.slo_ms and not result["failures"]:
+            capacity = count
+        else:
+            break
+    print(f"Sesiones por núcleo con p99 de retraso de tick <= {args.slo_ms:g} ms: {capacity}")
+
+
+if __name__ == "__main__":
+    main()
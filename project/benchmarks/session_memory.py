@@ -0,0 +1,162 @@
+"""Memoria por sesión viva y número máximo de sesiones por máquina.
+
+Uso: python benchmarks/session_memory.py [--sessions 300] [--vm-mb 1024] [--headroom 0.25]
+
+Crea N sesiones de TetrisApp sobre páginas Flet reales conectadas a una
+conexión local que procesa los comandos igual que el servidor pero sin enviar
+nada, las lleva a la pantalla de juego con cada renderer y mide la memoria
+Python (tracemalloc) y el RSS por sesión. Después cierra las sesiones como lo
+haría Flet al expirar la pestaña y comprueba cuánta memoria se recupera.
+Con el RSS base del proceso y el margen indicado calcula MEMORY_SESSIONS para una
+máquina de --vm-mb megas.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+# Las partidas de prueba que terminan no deben acabar en la cola real de puntuaciones
+os.environ.setdefault("SCORE_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "tetris_bench_spool.db"))
+
+import flet as ft  # noqa: E402
+from flet.core.local_connection import LocalConnection  # noqa: E402
+from flet.core.protocol import (  # noqa: E402
+    CommandEncoder,
+    PageCommandResponsePayload,
+    PageCommandsBatchResponsePayload,
+)
+
+import main as app_main  # noqa: E402
+from renderers import RENDERERS, RENDERER_ENV  # noqa: E402
+
+
+class SilentConnection(LocalConnection):
+    # Procesa los comandos como el servidor de sockets de Flet y descarta los mensajes;
+    # solo cuenta los envíos y los bytes que habrían viajado por el websocket
+    def __init__(self):
+        super().__init__()
+        self.sends = 0
+        self.bytes = 0
+
+    def _send(self, messages):
+        if messages:
+            self.sends += 1
+            self.bytes += len(json.dumps(messages, cls=CommandEncoder, separators=(",", ":")))
+
+    def send_command(self, session_id, command):
+        result, message = self._process_command(command)
+        self._send([message] if message else [])
+        return PageCommandResponsePayload(result=result, error="")
+
+    def send_commands(self, session_id, commands):
+        results = []
+        messages = []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        self._send(messages)
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+class FakeUser:
+    id = "00000000-0000-0000-0000-000000000000"
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def settle():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0], rss_bytes()
+
+
+def measure(renderer: str, count: int, trace: bool) -> dict:
+    # Cada medida corre en un proceso nuevo para que el RSS no reutilice memoria de otra;
+    # tracemalloc infla el RSS, así que el RSS se toma en una pasada sin él
+    os.environ[RENDERER_ENV] = renderer
+    app_main.MAX_SESSIONS = max(app_main.MAX_SESSIONS, count)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    conn = SilentConnection()
+
+    base_rss = rss_bytes()
+    if trace:
+        tracemalloc.start()
+    before, rss_before = settle()
+
+    pages = []
+    apps = []
+    for i in range(count):
+        page = ft.Page(conn, f"{renderer}-{i}", loop=loop)
+        app = app_main.TetrisApp(page)
+        pages.append(page)
+        apps.append(app)
+    login, _ = settle()
+
+    for app in apps:
+        app.user = FakeUser()
+        app.username = "jugador"
+        app.start_game()
+    playing, rss_playing = settle()
+
+    # Cierre de sesión como lo hace Flet al expirar la pestaña
+    for page in pages:
+        asyncio.run_coroutine_threadsafe(page.on_close(None), loop).result()
+        page._close()
+    del pages, apps, page, app
+    closed, _ = settle()
+    loop.call_soon_threadsafe(loop.stop)
+
+    return {
+        "renderer": renderer,
+        "login": (login - before) / count,
+        "playing": (playing - before) / count,
+        "rss": (rss_playing - rss_before) / count,
+        "leaked": (closed - before) / count,
+        "live": len(app_main.sessions),
+        "base_rss": base_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--vm-mb", type=int, default=1024)
+    parser.add_argument("--headroom", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sesiones por renderer, máquina de {args.vm_mb} MB con {args.headroom:.0%} de margen")
+    print(
+        f"{'renderer':<12}{'RSS base MB':>12}{'login KB':>10}{'juego KB':>10}"
+        f"{'RSS KB':>9}{'tras cerrar':>13}{'máx sesiones':>14}"
+    )
+    context = multiprocessing.get_context("spawn")
+    for name in RENDERERS:
+        with context.Pool(1) as pool:
+            result = pool.apply(measure, (name, args.sessions, True))
+        with context.Pool(1) as pool:
+            untraced = pool.apply(measure, (name, args.sessions, False))
+        budget = args.vm_mb * 2**20 * (1 - args.headroom) - untraced["base_rss"]
+        print(
+            f"{name:<12}{untraced['base_rss'] / 2**20:>12.1f}{result['login'] / 1024:>10.1f}"
+            f"{result['playing'] / 1024:>10.1f}{untraced['rss'] / 1024:>9.1f}"
+            f"{result['leaked']:>11.0f} B{budget / untraced['rss']:>14.0f}"
+        )
+        if result["live"]:
+            print(f"  {result['live']} sesiones siguen registradas tras cerrarse")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Coste de retransmitir una partida a N espectadores.
+
+Uso: python benchmarks/spectators.py [--viewers 10,100,300] [--duration 5] [--rate 8] [--slow 0.1]
+                                    [--renderer image]
+
+Un TetrisApp real juega en la pantalla de juego con --rate teclas por segundo
+(y la gravedad del planificador) mientras N TetrisApp lo ven desde la
+pantalla de espectador. En el modo `delta` el jugador publica un delta por
+tick en el hub y cada espectador aplica solo las celdas que cambiaron; en el
+modo `completo` cada espectador redibuja el tablero desde la partida en cada
+tick, como si fuera otra pestaña del jugador. Ambos usan el renderer de
+espectador (--renderer, por defecto SPECTATOR_RENDERER). Una fracción --slow de los
+espectadores está desconectada durante toda la medida y se reconecta al
+final: sus deltas se fusionan en el hueco en lugar de encolarse. Se informa
+de los envíos y bytes por espectador y tick, y del CPU del servidor por tick.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import flet as ft  # noqa: E402
+
+from session_memory import SilentConnection, FakeUser  # noqa: E402
+from input_burst import KeyEvent, KEYS  # noqa: E402
+import main as app_main  # noqa: E402
+from renderers import create_renderer  # noqa: E402
+from scheduler import scheduler  # noqa: E402
+from spectators import spectator_hub  # noqa: E402
+
+
+def watch_full_redraw(app, channel, player):
+    # Línea base: el espectador tiene su propio renderer y lo redibuja entero desde la partida
+    renderer = create_renderer(app_main.SPECTATOR_RENDERER)
+    app.page.add(renderer.control)
+    publish = player.timer.flush
+
+    def redraw():
+        controls = [control for control, _, _ in renderer.render(channel.game)]
+        if controls:
+            app.page.update(*controls)
+
+    timer = scheduler.frame_timer(redraw)
+
+    def flush():
+        publish()
+        scheduler.request_frame(timer)
+
+    player.timer.flush = flush
+    return timer
+
+
+async def scenario(mode: str, count: int, duration: float, rate: float, slow: float) -> dict:
+    loop = asyncio.get_running_loop()
+    player_conn = SilentConnection()
+    viewer_conn = SilentConnection()
+    paused_conn = SilentConnection()
+    paused_count = int(count * slow) if mode == "delta" else 0
+    player = app_main.TetrisApp(ft.Page(player_conn, f"{mode}-player", loop=loop))
+    player.user = FakeUser()
+    player.username = "jugador"
+    player.start_game()
+    channel = player.channel
+
+    viewers = []
+    for i in range(count):
+        conn = paused_conn if i < paused_count else viewer_conn
+        app = app_main.TetrisApp(ft.Page(conn, f"{mode}-{i}", loop=loop))
+        app.user = FakeUser()
+        if mode == "delta":
+            app.watch_game(channel)
+        else:
+            app.page.clean()
+            watch_full_redraw(app, channel, player)
+        viewers.append(app)
+    paused = viewers[:paused_count]
+    for app in paused:
+        await app.on_disconnect(None)
+
+    await asyncio.sleep(0.1)
+    rng = random.Random(1)
+    sends, sent_bytes = viewer_conn.sends, viewer_conn.bytes
+    ticks = scheduler.ticks + scheduler.frames
+    deltas, dropped = spectator_hub.deltas, spectator_hub.dropped
+    cpu = time.process_time()
+    start = loop.time()
+    presses = int(duration * rate)
+    for press in range(presses):
+        if player.timer is None:
+            break
+        # Nada de DROP: la partida dura toda la medida
+        await player.page.on_keyboard_event(KeyEvent(rng.choice(KEYS)))
+        await asyncio.sleep(max(0.0, start + (press + 1) / rate - loop.time()))
+    elapsed = loop.time() - start
+    cpu = time.process_time() - cpu
+    frames = scheduler.ticks + scheduler.frames - ticks
+    deltas = spectator_hub.deltas - deltas
+    dropped = spectator_hub.dropped - dropped
+    live = count - len(paused)
+    result = {
+        "mode": mode,
+        "viewers": count,
+        "deltas": deltas if mode == "delta" else frames,
+        "sends": (viewer_conn.sends - sends) / max(1, live) / elapsed,
+        "bytes": (viewer_conn.bytes - sent_bytes) / max(1, viewer_conn.sends - sends),
+        "cpu_ms": cpu / elapsed * 1000,
+        "cpu_per_delivery": cpu / max(1, (viewer_conn.sends - sends)),
+        "dropped": dropped,
+    }
+
+    # Los desconectados reciben de una vez lo acumulado
+    sends = paused_conn.sends
+    for app in paused:
+        await app.on_connect(None)
+    await asyncio.sleep(0.05)
+    result["resync"] = paused_conn.sends - sends
+
+    for app in viewers:
+        app.release()
+    player.release()
+    return result
+
+
+async def run_all(counts, duration, rate, slow) -> list:
+    results = []
+    for count in counts:
+        for mode in ("completo", "delta"):
+            results.append(await scenario(mode, count, duration, rate, slow))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", default="10,100,300")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=8, help="teclas por segundo del jugador")
+    parser.add_argument("--slow", type=float, default=0.1, help="fracción de espectadores desconectados")
+    parser.add_argument("--renderer", default=app_main.SPECTATOR_RENDERER)
+    args = parser.parse_args()
+
+    app_main.SPECTATOR_RENDERER = args.renderer
+
+    counts = [int(n) for n in args.viewers.split(",")]
+    app_main.MAX_SESSIONS = max(app_main.MAX_SESSIONS, max(counts) * 2 + 10)
+    print(
+        f"1 partida, renderer {args.renderer}, {args.rate:.0f} teclas/s, {args.duration:.0f} s, "
+        f"{args.slow:.0%} de espectadores desconectados"
+    )
+    print(
+        f"{'modo':<10}{'espect.':>8}{'deltas':>8}{'envíos/s':>10}{'B/envío':>9}"
+        f"{'CPU ms/s':>10}{'us/envío':>10}{'fusionados':>11}{'reenvíos':>10}"
+    )
+    results = asyncio.run(run_all(counts, args.duration, args.rate, args.slow))
+    for r in results:
+        print(
+            f"{r['mode']:<10}{r['viewers']:>8}{r['deltas']:>8}{r['sends']:>10.1f}{r['bytes']:>9.0f}"
+            f"{r['cpu_ms']:>10.1f}{r['cpu_per_delivery'] * 1e6:>10.0f}{r['dropped']:>11}{r['resync']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Arranque en frío: del proceso nuevo a la pantalla de login servida.
+
+Uso: python benchmarks/startup.py [--runs 5]
+
+Lanza `python src/main.py` como lo hace el contenedor (con un puerto libre y
+sin servidor de métricas), espera a que GET / responda 200 y abre el
+websocket de Flet como lo haría el navegador: el tiempo hasta el primer
+mensaje que contiene la pantalla de login es lo que espera el primer usuario
+cuando la máquina arranca desde cero. También resume `python -X importtime`
+de `import main` con los módulos que más tardan.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from websockets.sync.client import connect
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+LOGIN_MARKER = "Iniciar Sesi"
+READY_TIMEOUT = 60.0
+
+REGISTER = {
+    "action": "registerWebClient",
+    "payload": {
+        "pageName": "",
+        "pageRoute": "/",
+        "pageWidth": "1280",
+        "pageHeight": "800",
+        "windowWidth": "1280",
+        "windowHeight": "800",
+        "windowTop": "0",
+        "windowLeft": "0",
+        "isPWA": "false",
+        "isWeb": "true",
+        "isDebug": "false",
+        "platform": "linux",
+        "platformBrightness": "dark",
+        "media": "{}",
+        "sessionId": "",
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_http(url: str, deadline: float):
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{url} no respondió")
+        time.sleep(0.005)
+
+
+def wait_login(url: str, deadline: float):
+    with connect(url, open_timeout=READY_TIMEOUT, max_size=None) as ws:
+        ws.send(json.dumps(REGISTER))
+        while True:
+            message = ws.recv(timeout=max(0.0, deadline - time.perf_counter()))
+            if LOGIN_MARKER in message:
+                return
+
+
+def cold_start() -> dict:
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), METRICS_ENABLED="0")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(SRC, "main.py")],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = start + READY_TIMEOUT
+        wait_http(f"http://127.0.0.1:{port}/", deadline)
+        http = time.perf_counter() - start
+        wait_login(f"ws://127.0.0.1:{port}/ws", deadline)
+        login = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return {"http": http, "login": login}
+
+
+def import_times(top: int) -> tuple:
+    # Tiempo acumulado de cada import de primer nivel de main y total de `import main`
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+    ).stderr
+    total = 0
+    modules = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(1)), len(match.group(2)), match.group(3)
+        if indent == 1 and name == "main":
+            total = cumulative
+        elif indent == 3:
+            modules.append((cumulative, name))
+    modules.sort(reverse=True)
+    return total, modules[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=6)
+    args = parser.parse_args()
+
+    total, modules = import_times(args.top)
+    print(f"import main: {total / 1000:.0f} ms")
+    for cumulative, name in modules:
+        print(f"  {name:<20}{cumulative / 1000:>8.0f} ms")
+
+    results = [cold_start() for _ in range(args.runs)]
+    print(f"{args.runs} arranques en frío (mediana, mín-máx)")
+    for key, label in (("http", "GET / 200"), ("login", "login servido")):
+        values = sorted(r[key] for r in results)
+        print(
+            f"  {label:<16}{values[len(values) // 2] * 1000:>8.0f} ms"
+            f"{values[0] * 1000:>8.0f}-{values[-1] * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
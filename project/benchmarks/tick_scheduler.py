@@ -0,0 +1,117 @@
+"""Bucles de gravedad por sesión frente al planificador común de scheduler.py.
+
+Uso: python benchmarks/tick_scheduler.py [--sessions 500] [--duration 10]
+
+Cada sesión juega una partida real (drop_piece + render del tablero) con un
+nivel fijo entre 1 y 6. En el modo `sleep` cada sesión es una tarea con
+asyncio.sleep(intervalo), como el antiguo game_loop; en el modo `scheduler`
+todas comparten un TickScheduler. Se informa de los despertares del bucle de
+eventos por segundo, el retraso de cada tick respecto a su plazo ideal
+(inicio + k * intervalo), la deriva acumulada al final y el CPU consumido.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from tetris_game import TetrisGame  # noqa: E402
+from renderers import create_renderer  # noqa: E402
+from scheduler import TickScheduler, gravity_interval  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Session:
+    def __init__(self, seed: int):
+        self.game = TetrisGame(seed)
+        self.game.level = 1 + seed % 6
+        self.interval = gravity_interval(self.game.level)
+        self.renderer = create_renderer("canvas")
+        self.start = 0.0
+        self.count = 0
+        self.lateness = []
+
+    def tick(self):
+        self.count += 1
+        self.lateness.append(time.monotonic() - (self.start + self.count * self.interval))
+        if self.game.game_over:
+            self.game.reset_board()
+        self.game.drop_piece()
+
+    def flush(self):
+        self.renderer.render(self.game)
+
+
+async def run_sleep(sessions, duration):
+    wakeups = 0
+
+    async def loop(session):
+        nonlocal wakeups
+        session.start = time.monotonic()
+        end = session.start + duration
+        while time.monotonic() < end:
+            await asyncio.sleep(session.interval)
+            wakeups += 1
+            session.tick()
+            session.flush()
+
+    await asyncio.gather(*(loop(session) for session in sessions))
+    return wakeups
+
+
+async def run_scheduler(sessions, duration):
+    scheduler = TickScheduler()
+    scheduler.start(asyncio.get_running_loop())
+    for session in sessions:
+        timer = scheduler.schedule(session.tick, session.flush, session.interval)
+        session.start = timer.deadline * scheduler.resolution - session.interval
+    await asyncio.sleep(duration)
+    return scheduler.wakeups
+
+
+def measure(mode: str, count: int, duration: float) -> dict:
+    sessions = [Session(seed) for seed in range(count)]
+    cpu = time.process_time()
+    runner = run_sleep if mode == "sleep" else run_scheduler
+    wakeups = asyncio.run(runner(sessions, duration))
+    cpu = time.process_time() - cpu
+    lateness = [value for session in sessions for value in session.lateness]
+    drift = [session.lateness[-1] for session in sessions if session.lateness]
+    return {
+        "mode": mode,
+        "wakeups": wakeups / duration,
+        "ticks": len(lateness) / duration,
+        "p50": percentile(lateness, 0.5),
+        "p99": percentile(lateness, 0.99),
+        "drift": sum(drift) / len(drift),
+        "cpu": cpu / duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sesiones, {args.duration:.0f} s")
+    print(
+        f"{'modo':<11}{'despertares/s':>14}{'ticks/s':>9}{'p50 ms':>8}"
+        f"{'p99 ms':>8}{'deriva final ms':>17}{'CPU %':>7}"
+    )
+    for mode in ("sleep", "scheduler"):
+        r = measure(mode, args.sessions, args.duration)
+        print(
+            f"{r['mode']:<11}{r['wakeups']:>14.0f}{r['ticks']:>9.0f}{r['p50'] * 1000:>8.1f}"
+            f"{r['p99'] * 1000:>8.1f}{r['drift'] * 1000:>17.1f}{r['cpu'] * 100:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Motor vectorizado con NumPy: miles de tableros de TetrisGame a la vez.
+
+Uso: python -m batch_engine --boards 4096 --placements 200
+     python -m batch_engine --crosscheck --boards 64 --ticks 3000
+
+Todos los tableros viven en un array (N, BOARD_HEIGHT, BOARD_WIDTH) de ids de
+color y cada operación (movimiento, colisión, bloqueo, limpieza de líneas) se
+aplica a todos a la vez. La semántica es la de TetrisGame: mismas formas y
+rotaciones, misma tabla de puntos, misma regla de nivel y el mismo generador
+splitmix64, así que con la misma semilla y las mismas entradas cada tablero
+reproduce exactamente la partida escalar.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from tetris_game import (
+    BOARD_WIDTH,
+    BOARD_HEIGHT,
+    INPUTS,
+    LINE_POINTS,
+    ROTATIONS,
+    SHAPE_TYPES,
+    TetrisGame,
+)
+
+# (tipo, rotación, celda, x/y); todas las piezas tienen 4 celdas
+CELL_OFFSETS = np.array(
+    [[ROTATIONS[t][r].cells for r in range(4)] for t in SHAPE_TYPES], dtype=np.int64
+)
+WIDTHS = np.array([[ROTATIONS[t][r].width for r in range(4)] for t in SHAPE_TYPES], dtype=np.int64)
+SPAWN_X = BOARD_WIDTH // 2 - WIDTHS[:, 0] // 2
+POINTS = np.array([0] + [LINE_POINTS[n] for n in range(1, 5)], dtype=np.int64)
+
+# Códigos de entrada: índice en INPUTS; NO_INPUT = sin entrada en este tick
+INPUT_CODES = {name: code for code, name in enumerate(INPUTS)}
+NO_INPUT = -1
+LEFT, RIGHT, ROTATE, DOWN, DROP = (INPUT_CODES[name] for name in INPUTS)
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+class BatchTetris:
+    def __init__(self, seeds):
+        seeds = np.asarray(seeds, dtype=np.uint64)
+        n = len(seeds)
+        self.n = n
+        self.boards = np.zeros((n, BOARD_HEIGHT, BOARD_WIDTH), dtype=np.uint8)
+        self.rng = seeds.copy()
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        self.pieces = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+
+        everyone = np.arange(n)
+        self.piece = self._draw(everyone)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = SPAWN_X[self.piece]
+        self.y = np.zeros(n, dtype=np.int64)
+        self.game_over |= ~self._fits(everyone, self.rotation, self.x, self.y)
+        self.next_piece = self._draw(everyone)
+
+    def _draw(self, idx: np.ndarray) -> np.ndarray:
+        # splitmix64 vectorizado; la aritmética uint64 de NumPy ya es módulo 2**64
+        with np.errstate(over='ignore'):
+            z = self.rng[idx] + _GOLDEN
+            self.rng[idx] = z
+            z = (z ^ (z >> np.uint64(30))) * _MIX1
+            z = (z ^ (z >> np.uint64(27))) * _MIX2
+            z ^= z >> np.uint64(31)
+        return (((z >> np.uint64(32)) * np.uint64(len(SHAPE_TYPES))) >> np.uint64(32)).astype(np.int64)
+
+    def _fits(self, idx, rotation, x, y) -> np.ndarray:
+        offsets = CELL_OFFSETS[self.piece[idx], rotation]
+        cx = x[:, None] + offsets[:, :, 0]
+        cy = y[:, None] + offsets[:, :, 1]
+        inside = (cx >= 0) & (cx < BOARD_WIDTH) & (cy < BOARD_HEIGHT)
+        occupied = self.boards[
+            idx[:, None],
+            np.clip(cy, 0, BOARD_HEIGHT - 1),
+            np.clip(cx, 0, BOARD_WIDTH - 1),
+        ] != 0
+        return ~(~inside | ((cy >= 0) & occupied)).any(axis=1)
+
+    def _try_move(self, idx, rotation, x, y):
+        ok = self._fits(idx, rotation, x, y)
+        moved = idx[ok]
+        self.rotation[moved] = rotation[ok]
+        self.x[moved] = x[ok]
+        self.y[moved] = y[ok]
+
+    def _drop_distance(self, idx) -> np.ndarray:
+        distance = np.zeros(len(idx), dtype=np.int64)
+        falling = np.arange(len(idx))
+        while len(falling):
+            sub = idx[falling]
+            ok = self._fits(sub, self.rotation[sub], self.x[sub], self.y[sub] + distance[falling] + 1)
+            falling = falling[ok]
+            distance[falling] += 1
+        return distance
+
+    def _lock(self, idx):
+        if not len(idx):
+            return
+        offsets = CELL_OFFSETS[self.piece[idx], self.rotation[idx]]
+        cx = self.x[idx, None] + offsets[:, :, 0]
+        cy = self.y[idx, None] + offsets[:, :, 1]
+        visible = cy >= 0
+        rows = np.broadcast_to(idx[:, None], cy.shape)
+        colors = np.broadcast_to((self.piece[idx] + 1)[:, None], cy.shape)
+        self.boards[rows[visible], cy[visible], cx[visible]] = colors[visible]
+        self.pieces[idx] += 1
+
+        self._clear_lines(idx)
+        self._spawn(idx)
+
+    def _clear_lines(self, idx):
+        full = (self.boards[idx] != 0).all(axis=2)
+        cleared = full.sum(axis=1)
+        hit = cleared > 0
+        if not hit.any():
+            return
+        idx, full, cleared = idx[hit], full[hit], cleared[hit]
+
+        # Orden estable: primero las filas llenas (que se vacían) y luego el resto
+        order = np.argsort(~full, axis=1, kind='stable')
+        boards = np.take_along_axis(self.boards[idx], order[:, :, None], axis=1)
+        boards[np.arange(BOARD_HEIGHT)[None, :] < cleared[:, None]] = 0
+        self.boards[idx] = boards
+
+        self.lines[idx] += cleared
+        self.score[idx] += POINTS[cleared] * self.level[idx]
+        self.level[idx] += self.lines[idx] >= self.level[idx] * 10
+
+    def _spawn(self, idx):
+        self.piece[idx] = self.next_piece[idx]
+        self.rotation[idx] = 0
+        self.x[idx] = SPAWN_X[self.piece[idx]]
+        self.y[idx] = 0
+        self.game_over[idx] |= ~self._fits(idx, self.rotation[idx], self.x[idx], self.y[idx])
+        self.next_piece[idx] = self._draw(idx)
+
+    def apply_inputs(self, inputs: np.ndarray):
+        inputs = np.asarray(inputs)
+        live = ~self.game_over
+        for code, dx, dy in ((LEFT, -1, 0), (RIGHT, 1, 0), (DOWN, 0, 1)):
+            idx = np.flatnonzero(live & (inputs == code))
+            if len(idx):
+                self._try_move(idx, self.rotation[idx], self.x[idx] + dx, self.y[idx] + dy)
+
+        idx = np.flatnonzero(live & (inputs == ROTATE))
+        if len(idx):
+            self._try_move(idx, (self.rotation[idx] + 1) & 3, self.x[idx], self.y[idx])
+
+        self.hard_drop(np.flatnonzero(live & (inputs == DROP)))
+
+    def hard_drop(self, idx):
+        if len(idx):
+            self.y[idx] += self._drop_distance(idx)
+            self._lock(idx)
+
+    def drop_pieces(self, idx=None):
+        # Gravedad: baja una fila o bloquea, como TetrisGame.drop_piece
+        if idx is None:
+            idx = np.flatnonzero(~self.game_over)
+        ok = self._fits(idx, self.rotation[idx], self.x[idx], self.y[idx] + 1)
+        self.y[idx[ok]] += 1
+        self._lock(idx[~ok])
+
+    def place(self, rotation, x):
+        # Coloca la pieza de cada tablero vivo en (rotación, columna) y la deja caer;
+        # si la pose no cabe en la fila de aparición, cae desde donde está
+        idx = np.flatnonzero(~self.game_over)
+        rotation = np.asarray(rotation)[idx] & 3
+        x = np.clip(np.asarray(x)[idx], 0, BOARD_WIDTH - WIDTHS[self.piece[idx], rotation])
+        self._try_move(idx, rotation, x, self.y[idx])
+        self.hard_drop(idx)
+
+
+def _mismatch(batch: BatchTetris, games, tick: int):
+    for i, game in enumerate(games):
+        expected = {
+            'board': bytes(game.board.colors),
+            'piece': (SHAPE_TYPES.index(game.current_piece.type), game.current_piece.rotation,
+                      game.current_piece.x, game.current_piece.y),
+            'next': SHAPE_TYPES.index(game.next_piece.type),
+            'stats': (game.score, game.level, game.lines_cleared, game.pieces, game.game_over),
+        }
+        actual = {
+            'board': batch.boards[i].tobytes(),
+            'piece': (int(batch.piece[i]), int(batch.rotation[i]), int(batch.x[i]), int(batch.y[i])),
+            'next': int(batch.next_piece[i]),
+            'stats': (int(batch.score[i]), int(batch.level[i]), int(batch.lines[i]),
+                      int(batch.pieces[i]), bool(batch.game_over[i])),
+        }
+        for key in expected:
+            if expected[key] != actual[key]:
+                return f"tick {tick}, tablero {i}, {key}: escalar={expected[key]} vectorizado={actual[key]}"
+    return None
+
+
+def _greedy_placement(game: TetrisGame):
+    # Colocación más baja posible; basta para que el cruce de motores limpie líneas
+    piece = game.current_piece
+    best = (-1, piece.rotation, piece.x)
+    for rotation, state in enumerate(ROTATIONS[piece.type]):
+        for x in range(BOARD_WIDTH - state.width + 1):
+            if game.board.collides(state.masks, x, piece.y):
+                continue
+            landing = piece.y + game.board.drop_distance(state, x, piece.y) + len(state.masks)
+            if landing > best[0]:
+                best = (landing, rotation, x)
+    return best[1], best[2]
+
+
+def _place_scalar(game: TetrisGame, rotation: int, x: int):
+    piece = game.current_piece
+    state = ROTATIONS[piece.type][rotation]
+    x = min(max(x, 0), BOARD_WIDTH - state.width)
+    if not game.board.collides(state.masks, x, piece.y):
+        piece.rotation = rotation
+        piece.x = x
+    game.hard_drop()
+
+
+def cross_check(boards: int, ticks: int, seed: int) -> bool:
+    seeds = [seed + i for i in range(boards)]
+    batch = BatchTetris(seeds)
+    games = [TetrisGame(s) for s in seeds]
+    rng = np.random.default_rng(seed)
+
+    for tick in range(ticks):
+        if tick % 2:
+            # Tick de colocaciones completas, elegidas por el motor escalar
+            rotation = np.zeros(boards, dtype=np.int64)
+            x = np.zeros(boards, dtype=np.int64)
+            for i, game in enumerate(games):
+                if not game.game_over:
+                    rotation[i], x[i] = _greedy_placement(game)
+                    _place_scalar(game, int(rotation[i]), int(x[i]))
+            batch.place(rotation, x)
+        else:
+            inputs = rng.choice(
+                [NO_INPUT, LEFT, RIGHT, ROTATE, DOWN, DROP], size=boards, p=[0.3, 0.2, 0.2, 0.15, 0.1, 0.05]
+            )
+            for game, code in zip(games, inputs):
+                if game.game_over:
+                    continue
+                if code != NO_INPUT:
+                    game.apply_input(INPUTS[code])
+                if not game.game_over:
+                    game.drop_piece()
+            batch.apply_inputs(inputs)
+            batch.drop_pieces()
+
+        error = _mismatch(batch, games, tick)
+        if error:
+            print(f"DIFERENCIA en {error}", file=sys.stderr)
+            return False
+        if batch.game_over.all():
+            break
+
+    print(
+        f"OK: {boards} tableros coinciden durante {tick + 1} ticks "
+        f"({int(batch.pieces.sum())} piezas, {int(batch.lines.sum())} líneas)",
+        file=sys.stderr,
+    )
+    return True
+
+
+def benchmark(boards: int, placements: int, seed: int):
+    batch = BatchTetris([seed + i for i in range(boards)])
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    total = 0
+    for _ in range(placements):
+        live = int((~batch.game_over).sum())
+        if not live:
+            break
+        batch.place(rng.integers(0, 4, boards), rng.integers(0, BOARD_WIDTH, boards))
+        total += live
+    elapsed = time.perf_counter() - start
+    print(
+        f"{total} colocaciones en {elapsed:.2f} s: {total / elapsed * 60 / 1e6:.2f} M/min "
+        f"({boards} tableros)",
+        file=sys.stderr,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motor de Tetris vectorizado con NumPy")
+    parser.add_argument('--boards', type=int, default=4096)
+    parser.add_argument('--placements', type=int, default=200)
+    parser.add_argument('--ticks', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--crosscheck', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.crosscheck:
+        sys.exit(0 if cross_check(args.boards, args.ticks, args.seed) else 1)
+    benchmark(args.boards, args.placements, args.seed)
+
+
+if __name__ == '__main__':
+    main()
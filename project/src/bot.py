@@ -0,0 +1,289 @@
+"""Búsqueda de colocaciones para jugar solo o sugerir jugadas.
+
+Uso: python -m bot [--games 20] [--seed 0] [--max-pieces 2000] [--no-lookahead]
+
+Para la pieza actual se recorren todas las colocaciones alcanzables (rotación
+y columna, con la pieza girada y desplazada a su altura actual y dejada caer)
+y se puntúan con la heurística clásica de altura agregada, líneas, huecos e
+irregularidad. Con lookahead, las mejores se combinan con todas las de la
+pieza siguiente. El tablero nunca se copia entero por candidato: cada
+colocación trabaja sobre las 20 filas como enteros de bits y solo recorre las
+filas ocupadas. Sin argumentos juega partidas completas e informa del tiempo
+por pieza y de las líneas conseguidas.
+"""
+import argparse
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from tetris_game import (
+    TetrisGame, Piece, ROTATIONS, RotationState, BOARD_WIDTH, BOARD_HEIGHT, FULL_ROW,
+)
+
+# Pesos de la heurística (Yiyuan Lee, optimizados con un algoritmo genético)
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+# Colocaciones de la pieza actual que se combinan con la siguiente
+LOOKAHEAD_BEAM = 4
+GAME_OVER_SCORE = float('-inf')
+# Bits de las columnas 0..8: cada uno compara una columna con la siguiente
+NEIGHBOUR_MASK = FULL_ROW >> 1
+
+# Rotaciones con forma distinta de cada pieza: la O tiene una; la I, la S y la Z, dos
+DISTINCT_ROTATIONS = {
+    shape_type: tuple(
+        rotation for rotation, state in enumerate(states)
+        if all(state.masks != states[other].masks for other in range(rotation))
+    )
+    for shape_type, states in ROTATIONS.items()
+}
+# Rotaciones con la misma forma, para llegar a ella con el menor número de giros
+SAME_SHAPE = {
+    shape_type: {
+        rotation: tuple(other for other in range(4) if states[other].masks == states[rotation].masks)
+        for rotation in DISTINCT_ROTATIONS[shape_type]
+    }
+    for shape_type, states in ROTATIONS.items()
+}
+
+
+class Placement(NamedTuple):
+    rotation: int
+    x: int
+    y: int
+    lines: int
+    score: float
+
+
+def _fits(rows: Sequence[int], state: RotationState, x: int, y: int) -> bool:
+    if x < 0 or x + state.width > BOARD_WIDTH:
+        return False
+    for mask in state.masks:
+        if y >= BOARD_HEIGHT or (y >= 0 and rows[y] & (mask << x)):
+            return False
+        y += 1
+    return True
+
+
+def _landing(rows: Sequence[int], heights: Sequence[int], state: RotationState, x: int, y: int) -> int:
+    # Con la pieza por encima de la superficie de cada columna basta con las alturas
+    distance = BOARD_HEIGHT
+    for dx, bottom in enumerate(state.bottom):
+        d = BOARD_HEIGHT - 1 - heights[x + dx] - y - bottom
+        if d < distance:
+            distance = d
+    if distance < 0:
+        # Bajo un saliente: se baja fila a fila
+        distance = 0
+        while _fits(rows, state, x, y + distance + 1):
+            distance += 1
+    return y + distance
+
+
+def _place(rows: Sequence[int], state: RotationState, x: int, y: int) -> Tuple[List[int], int]:
+    # Copia de 20 enteros; las filas llenas se quitan y entran vacías por arriba
+    placed = rows[:]
+    full = 0
+    for mask in state.masks:
+        row = placed[y] | (mask << x)
+        placed[y] = row
+        if row == FULL_ROW:
+            full += 1
+        y += 1
+    if full:
+        placed = [row for row in placed if row != FULL_ROW]
+        placed[:0] = [0] * full
+    return placed, full
+
+
+def evaluate(rows: Sequence[int], top: int = 0) -> float:
+    # Una pasada de arriba abajo desde la primera fila que puede estar ocupada (top).
+    # covered son las columnas con alguna celda encima o en esta fila, así que por fila:
+    # cada columna cubierta suma 1 a su altura, cada celda vacía cubierta es un hueco y
+    # cada par de columnas vecinas con solo una cubierta suma 1 a la irregularidad.
+    # No incluye las líneas
+    covered = 0
+    holes = 0
+    total = 0
+    bumpiness = 0
+    for y in range(top, BOARD_HEIGHT):
+        row = rows[y]
+        holes += (covered & ~row).bit_count()
+        covered |= row
+        total += covered.bit_count()
+        bumpiness += ((covered ^ (covered >> 1)) & NEIGHBOUR_MASK).bit_count()
+    return HEIGHT_WEIGHT * total + HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness
+
+
+def column_heights(rows: Sequence[int], top: int = 0) -> List[int]:
+    heights = [0] * BOARD_WIDTH
+    pending = FULL_ROW
+    for y in range(top, BOARD_HEIGHT):
+        found = rows[y] & pending
+        while found:
+            low = found & -found
+            heights[low.bit_length() - 1] = BOARD_HEIGHT - y
+            found ^= low
+        pending &= ~rows[y]
+        if not pending:
+            break
+    return heights
+
+
+def _reachable(rows: Sequence[int], shape_type: str, rotation: int, x: int, y: int) -> dict:
+    # Rotación inicial -> {rotación: (columna mínima, columna máxima)} alcanzables girando
+    # primero y desplazando después, a la altura actual de la pieza
+    states = ROTATIONS[shape_type]
+    result = {}
+    current = rotation
+    for presses in range(4):
+        state = states[current]
+        if presses and not _fits(rows, state, x, y):
+            break
+        low = x
+        while _fits(rows, state, low - 1, y):
+            low -= 1
+        high = x
+        while _fits(rows, state, high + 1, y):
+            high += 1
+        result[current] = (low, high)
+        current = (current + 1) & 3
+    return result
+
+
+def placements(
+    rows: Sequence[int], heights: Sequence[int], shape_type: str, rotation: int, x: int, y: int,
+) -> List[Tuple[int, int, int]]:
+    states = ROTATIONS[shape_type]
+    reach = _reachable(rows, shape_type, rotation, x, y)
+    found = []
+    for distinct in DISTINCT_ROTATIONS[shape_type]:
+        # De las rotaciones con esta forma, la que menos giros necesita
+        options = [r for r in SAME_SHAPE[shape_type][distinct] if r in reach]
+        if not options:
+            continue
+        target = min(options, key=lambda r: (r - rotation) & 3)
+        state = states[target]
+        low, high = reach[target]
+        for column in range(low, high + 1):
+            found.append((target, column, _landing(rows, heights, state, column, y)))
+    return found
+
+
+def _spawn(shape_type: str) -> Tuple[int, int]:
+    return BOARD_WIDTH // 2 - ROTATIONS[shape_type][0].width // 2, 0
+
+
+def best_placement(game: TetrisGame, lookahead: bool = True, beam: int = LOOKAHEAD_BEAM) -> Optional[Placement]:
+    piece = game.current_piece
+    if piece is None or game.game_over:
+        return None
+    rows = game.board.rows
+    board_top = BOARD_HEIGHT - max(game.board.heights)
+    states = ROTATIONS[piece.type]
+
+    scored = []
+    for rotation, x, y in placements(rows, game.board.heights, piece.type, piece.rotation, piece.x, piece.y):
+        placed, lines = _place(rows, states[rotation], x, y)
+        top = min(board_top, y) + lines
+        score = evaluate(placed, top) + LINES_WEIGHT * lines
+        scored.append((score, rotation, x, y, lines, placed, top))
+    if not scored:
+        return None
+    scored.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    next_piece = game.next_piece
+    if not lookahead or next_piece is None:
+        score, rotation, x, y, lines = scored[0][:5]
+        return Placement(rotation, x, y, lines, score)
+
+    next_states = ROTATIONS[next_piece.type]
+    spawn_x, spawn_y = _spawn(next_piece.type)
+    best = None
+    for _, rotation, x, y, lines, placed, top in scored[:beam]:
+        if not _fits(placed, next_states[0], spawn_x, spawn_y):
+            # La siguiente pieza no cabría: fin de la partida
+            total = GAME_OVER_SCORE
+        else:
+            total = GAME_OVER_SCORE
+            for next_rotation, next_x, next_y in placements(
+                placed, column_heights(placed, top), next_piece.type, 0, spawn_x, spawn_y,
+            ):
+                final, next_lines = _place(placed, next_states[next_rotation], next_x, next_y)
+                score = evaluate(final, min(top, next_y) + next_lines) + LINES_WEIGHT * (lines + next_lines)
+                if score > total:
+                    total = score
+        if best is None or total > best.score:
+            best = Placement(rotation, x, y, lines, total)
+    return best
+
+
+def placement_actions(piece: Piece, placement: Placement) -> List[str]:
+    # Entradas de TetrisGame.apply_input: girar, desplazar y dejar caer
+    actions = ['rotate'] * ((placement.rotation - piece.rotation) & 3)
+    dx = placement.x - piece.x
+    actions.extend(['right' if dx > 0 else 'left'] * abs(dx))
+    actions.append('drop')
+    return actions
+
+
+def placement_cells(piece: Piece, placement: Placement) -> List[int]:
+    # Índices del tablero (y * BOARD_WIDTH + x) que ocuparía la pieza colocada
+    state = ROTATIONS[piece.type][placement.rotation]
+    return [
+        (placement.y + dy) * BOARD_WIDTH + placement.x + dx
+        for dx, dy in state.cells
+        if placement.y + dy >= 0
+    ]
+
+
+class BotPolicy:
+    # Política para simulate.py: en cada tick coloca la pieza actual entera
+    def __init__(self, seed: int, lookahead: bool = True):
+        self.lookahead = lookahead
+
+    def __call__(self, game: TetrisGame) -> List[str]:
+        placement = best_placement(game, self.lookahead)
+        if placement is None:
+            return ['drop']
+        return placement_actions(game.current_piece, placement)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bot de colocaciones de Tetris")
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-pieces', type=int, default=2000)
+    parser.add_argument('--no-lookahead', action='store_true')
+    args = parser.parse_args(argv)
+
+    policy = BotPolicy(0, lookahead=not args.no_lookahead)
+    pieces = 0
+    lines = []
+    worst = 0.0
+    elapsed = 0.0
+    for i in range(args.games):
+        game = TetrisGame(args.seed + i)
+        while not game.game_over and game.pieces < args.max_pieces:
+            start = time.perf_counter()
+            actions = policy(game)
+            spent = time.perf_counter() - start
+            elapsed += spent
+            worst = max(worst, spent)
+            pieces += 1
+            for action in actions:
+                game.apply_input(action)
+        lines.append(game.lines_cleared)
+
+    lines.sort()
+    print(
+        f"{args.games} partidas ({'sin' if args.no_lookahead else 'con'} lookahead, "
+        f"máx {args.max_pieces} piezas): {elapsed / pieces * 1000:.3f} ms/pieza de media, "
+        f"{worst * 1000:.2f} ms la peor; líneas mediana {lines[len(lines) // 2]}, "
+        f"mín {lines[0]}, máx {lines[-1]}"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional
+
+from metrics import db_call
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+TOP_N = 10
+PAGE_SIZE = 10
+GLOBAL_REFRESH = float(os.getenv("LEADERBOARD_GLOBAL_REFRESH", 60))
+MAX_CACHED_USERS = 5000
+
+
+
+def _rank_key(row: dict):
+    return (row["score"], row["created_at"])
+
+
+class UserScores:
+    __slots__ = ('rows', 'complete')
+
+    def __init__(self, rows: List[dict], complete: bool):
+        # Prefijo exacto de las partidas del usuario ordenadas por (score, created_at) desc
+        self.rows = rows
+        self.complete = complete
+
+
+class LeaderboardCache:
+    def __init__(self):
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self._global_rows = []
+        self._global_loaded_at = 0.0
+        self._global_refreshing = False
+        self._ranks = {}
+        self.queries = 0
+
+    # Las funciones RPC solo se conceden a `authenticated`: cada consulta usa el cliente
+    # con sesión de quien la pide, aunque el resultado quede en la caché común
+    def _query_user(self, client: "Client", user_id, after: Optional[dict], limit: int) -> List[dict]:
+        # Paginación por clave: continúa justo después de la última fila mostrada
+        params = {"p_user_id": user_id, "p_limit": limit}
+        if after is not None:
+            params["p_after_score"] = after["score"]
+            params["p_after_created_at"] = after["created_at"]
+        self.queries += 1
+        with db_call("scores.user_top"):
+            return client.rpc("user_top_scores", params).execute().data
+
+    def cached_user_top(self, user_id) -> Optional[List[dict]]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            self._users.move_to_end(user_id)
+            return entry.rows[:]
+
+    def user_top(self, client: "Client", user_id) -> List[dict]:
+        rows = self.cached_user_top(user_id)
+        if rows is not None:
+            return rows
+        rows = self._query_user(client, user_id, None, TOP_N)
+        with self._lock:
+            self._users[user_id] = UserScores(rows, len(rows) < TOP_N)
+            if len(self._users) > MAX_CACHED_USERS:
+                self._users.popitem(last=False)
+        return rows[:]
+
+    def has_more(self, user_id, shown: int) -> bool:
+        with self._lock:
+            entry = self._users.get(user_id)
+            return entry is not None and (len(entry.rows) > shown or not entry.complete)
+
+    def user_page(self, client: "Client", user_id, shown: int) -> List[dict]:
+        # Devuelve las filas siguientes a las `shown` primeras, desde la caché si ya las tiene
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return []
+            if len(entry.rows) > shown or entry.complete:
+                return entry.rows[shown:shown + PAGE_SIZE]
+            after = entry.rows[-1] if entry.rows else None
+
+        rows = self._query_user(client, user_id, after, PAGE_SIZE)
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None and (entry.rows[-1] if entry.rows else None) == after:
+                entry.rows.extend(rows)
+                entry.complete = len(rows) < PAGE_SIZE
+        return rows
+
+    def record_score(self, user_id, row: dict):
+        # Actualiza en memoria la caché del usuario con su propia partida recién escrita
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            rows = entry.rows
+            key = _rank_key(row)
+            if not entry.complete and rows and key < _rank_key(rows[-1]):
+                return
+            index = len(rows)
+            while index and _rank_key(rows[index - 1]) < key:
+                index -= 1
+            rows.insert(index, row)
+
+    def rank(self, client: "Client", score: int) -> int:
+        # Posición global de una puntuación; se recalcula al refrescar el top global
+        with self._lock:
+            rank = self._ranks.get(score)
+        if rank is not None:
+            return rank
+        self.queries += 1
+        with db_call("scores.rank"):
+            rank = client.rpc("score_rank", {"p_score": score}).execute().data
+        with self._lock:
+            if len(self._ranks) >= MAX_CACHED_USERS:
+                self._ranks.clear()
+            self._ranks[score] = rank
+        return rank
+
+    def global_top(self, client: "Client") -> List[dict]:
+        with self._lock:
+            rows = self._global_rows
+            stale = time.monotonic() - self._global_loaded_at > GLOBAL_REFRESH
+            refresh = stale and not self._global_refreshing
+            if refresh:
+                self._global_refreshing = True
+
+        if refresh:
+            if rows:
+                # Sirve la copia anterior y refresca en segundo plano
+                threading.Thread(target=self._refresh_global, args=(client,), daemon=True).start()
+            else:
+                self._refresh_global(client)
+                rows = self._global_rows
+        return rows
+
+    def _refresh_global(self, client: "Client"):
+        try:
+            self.queries += 1
+            with db_call("scores.global_top"):
+                rows = client.rpc("global_top_scores", {"p_limit": TOP_N}).execute().data
+            for row in rows:
+                row["username"] = row["username"] or "?"
+            with self._lock:
+                self._global_rows = rows
+                self._global_loaded_at = time.monotonic()
+                self._ranks = {}
+        except Exception as ex:
+            print(f"Error refreshing global leaderboard: {ex}")
+        finally:
+            with self._lock:
+                self._global_refreshing = False
+
+
+leaderboard_cache = LeaderboardCache()
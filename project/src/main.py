@@ -1,12 +1,88 @@
 import flet as ft
+import atexit
+import base64
 import os
-import random
 import asyncio
-from supabase_client import supabase
+import time
+from collections import deque
+from datetime import datetime, timezone
+from supabase_client import create_session_client, run_db, run_session_db
 from tetris_game import TetrisGame, BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE
+from questions import question_cache
+from score_writer import score_writer
+from leaderboard import leaderboard_cache, TOP_N
+from scheduler import scheduler, gravity_interval
+from snapshots import snapshot_writer, encode_session, decode_session, SNAPSHOT_INTERVAL
+from spectators import spectator_hub
+import metrics
+
+# Sesiones por máquina: ver benchmarks/session_memory.py, benchmarks/load_test.py y la
+# sección "Capacidad" del README. La CPU se agota antes que la memoria: un núcleo aguanta
+# ~100 sesiones jugando a la vez, y 1 GB da para ~1800 sesiones con el renderer canvas
+SESSIONS_PER_CORE = int(os.getenv("SESSIONS_PER_CORE", 100))
+MEMORY_SESSIONS = int(os.getenv("MEMORY_SESSIONS", 1800))
+# Núcleos asignados al proceso, no los del host (contenedores y máquinas compartidas de Fly)
+CPU_CORES = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", min(MEMORY_SESSIONS, SESSIONS_PER_CORE * CPU_CORES)))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", 900))
+# Entradas pendientes por sesión entre dos frames; el resto de una ráfaga se descarta
+MAX_QUEUED_INPUTS = 8
+# Los espectadores solo reciben el tablero: con `image` cada envío es un único control
+SPECTATOR_RENDERER = os.getenv("SPECTATOR_RENDERER", "image")
+# Partidas en directo listadas en la pantalla de espectador (las de más puntos)
+LIVE_GAMES_SHOWN = 20
+
+KEY_ACTIONS = {
+    "Arrow Left": "left",
+    "Arrow Right": "right",
+    "Arrow Up": "rotate",
+    "Arrow Down": "down",
+    " ": "drop",
+    "Space": "drop",
+}
+
+# Estilos compartidos por todas las sesiones (Flet solo los serializa)
+BOARD_BORDER = ft.border.all(2, ft.Colors.WHITE)
+ROW_BORDER = ft.border.all(1, ft.Colors.BLUE_700)
+PLAY_STYLE = ft.ButtonStyle(color=ft.Colors.WHITE, bgcolor=ft.Colors.GREEN_700)
+SCORES_STYLE = ft.ButtonStyle(color=ft.Colors.WHITE, bgcolor=ft.Colors.BLUE_700)
+EXIT_STYLE = ft.ButtonStyle(color=ft.Colors.WHITE, bgcolor=ft.Colors.RED_700)
+
+sessions = set()
+
+metrics.Gauge("tetris_sessions", "Sesiones abiertas", lambda: len(sessions))
+metrics.Gauge(
+    "tetris_game_loops", "Partidas con gravedad en marcha",
+    lambda: sum(1 for app in list(sessions) if app.timer is not None),
+)
+metrics.Gauge("tetris_score_spool_pending", "Puntuaciones pendientes de subir", score_writer.pending)
+metrics.Gauge("tetris_score_spool_parked", "Puntuaciones apartadas por rechazo permanente", score_writer.parked)
+metrics.CounterFunc("tetris_scheduler_wakeups_total", "Despertares del planificador", lambda: scheduler.wakeups)
+metrics.CounterFunc("tetris_scheduler_ticks_total", "Ticks de gravedad ejecutados", lambda: scheduler.ticks)
+metrics.CounterFunc("tetris_scheduler_resyncs_total", "Plazos resincronizados por retraso", lambda: scheduler.resyncs)
+metrics.CounterFunc("tetris_scheduler_frames_total", "Frames de entradas procesados", lambda: scheduler.frames)
+metrics.Gauge("tetris_live_games", "Partidas en directo que se pueden ver", lambda: len(spectator_hub.live()))
+metrics.Gauge("tetris_spectators", "Espectadores viendo una partida", spectator_hub.viewers)
+metrics.CounterFunc("tetris_spectator_deltas_total", "Deltas publicados por las partidas vistas", lambda: spectator_hub.deltas)
+metrics.CounterFunc(
+    "tetris_spectator_dropped_total", "Deltas fusionados en el hueco de un espectador sin enviar",
+    lambda: spectator_hub.dropped,
+)
+
+
+def reap_idle_sessions():
+    now = time.monotonic()
+    for app in [app for app in sessions if now - app.last_activity > SESSION_IDLE_TIMEOUT]:
+        app.expire()
 
 
 class TetrisApp:
+    __slots__ = (
+        'page', 'user', 'username', 'game', 'replay', 'game_loop_running',
+        'current_question', 'timer', 'last_activity', 'saved_game', 'db', 'profiles',
+        'channel', 'viewer',
+    )
+
     def __init__(self, page: ft.Page):
         self.page = page
         self.page.title = "Tetris Game"
@@ -18,48 +94,177 @@ class TetrisApp:
         self.user = None
         self.username = ""
         self.game = None
+        self.replay = None
+        self.game_loop_running = False
+        self.current_question = None
+        self.timer = None
+        self.last_activity = time.monotonic()
+        # Última instantánea de la partida en curso; el menú ofrece continuarla
+        self.saved_game = None
+        # Cliente de Supabase propio (token de este usuario), creado con el primer login
+        self.db = None
+        # Nombre de usuario por id: volver a entrar en la misma pestaña no repite la consulta
+        self.profiles = {}
+        # Canal de la partida propia para los espectadores y partida ajena que se está viendo
+        self.channel = None
+        self.viewer = None
+
+        reap_idle_sessions()
+        if len(sessions) >= MAX_SESSIONS:
+            self.page.add(ft.Text("Servidor lleno, inténtalo en unos minutos", size=24))
+            return
+
+        sessions.add(self)
+        self.page.on_disconnect = self.on_disconnect
+        self.page.on_connect = self.on_connect
+        self.page.on_close = self.on_close
+        self.show_login()
+
+    def stop_game_loop(self):
         self.game_loop_running = False
+        # El manejador de teclado retiene la partida por su cierre: fuera de ella no debe quedar vivo
+        self.page.on_keyboard_event = None
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.channel is not None:
+            spectator_hub.close(self.channel)
+            self.channel = None
+
+    def stop_watching(self):
+        if self.viewer is not None:
+            spectator_hub.leave(self.viewer)
+            self.viewer = None
+
+    def save_game(self):
+        if self.user and self.game and self.replay and not self.game.game_over:
+            self.saved_game = encode_session(self.game, self.replay)
+            snapshot_writer.save(self.user.id, self.saved_game)
+
+    # Los manejadores de la sesión son async para que Flet los ejecute en el bucle de eventos,
+    # como el flush del planificador: desde un hilo del executor save_game podría leer la
+    # partida a mitad de un lock_piece y guardar una instantánea inconsistente
+    async def on_disconnect(self, e):
+        # Sin conexión no hay a quién enviar frames: se pausa la partida y se guarda
+        self.stop_game_loop()
+        self.save_game()
+        if self.viewer is not None:
+            spectator_hub.pause(self.viewer)
+
+    async def on_connect(self, e):
+        if self.viewer is not None:
+            # Recibe de una vez lo que cambió mientras estaba desconectado
+            spectator_hub.resume(self.viewer)
+        elif self.user and self.game and not self.game.game_over:
+            self.show_menu()
+
+    async def on_close(self, e):
+        self.release()
+
+    def session_db(self):
+        if self.db is None:
+            self.db = create_session_client()
+        return self.db
+
+    def release(self):
+        self.stop_game_loop()
+        self.stop_watching()
+        self.save_game()
+        self.game = None
+        self.replay = None
         self.current_question = None
+        sessions.discard(self)
+
+    def expire(self):
+        self.release()
+        self.user = None
+        self.username = ""
+        try:
+            self.page.clean()
+            self.page.add(
+                ft.Column(
+                    [
+                        ft.Text("Sesión cerrada por inactividad", size=24),
+                        ft.ElevatedButton("Volver a entrar", on_click=lambda e: self.reopen(), width=300),
+                    ],
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                )
+            )
+        except Exception:
+            # La página ya no está conectada
+            pass
 
+    def reopen(self):
+        self.last_activity = time.monotonic()
+        if len(sessions) >= MAX_SESSIONS:
+            return
+        sessions.add(self)
         self.show_login()
 
     def show_login(self):
+        self.last_activity = time.monotonic()
         self.page.clean()
 
         email_field = ft.TextField(label="Correo", width=300, autofocus=True)
         password_field = ft.TextField(label="Contraseña", password=True, width=300)
         error_text = ft.Text("", color=ft.Colors.RED)
-        
-        def login_click(e):
+        progress = ft.ProgressRing(width=24, height=24, visible=False)
+        login_button = ft.ElevatedButton("Iniciar Sesión", width=300)
+
+        async def login_click(e):
+            login_button.disabled = True
+            progress.visible = True
+            error_text.value = ""
+            self.page.update()
             try:
-                response = supabase.auth.sign_in_with_password({
-                    "email": email_field.value,
-                    "password": password_field.value
-                })
+                # El cliente se crea dentro del pool: si el SDK aún se está importando, no bloquea el bucle
+                response = await run_db(
+                    lambda: self.session_db().auth.sign_in_with_password({
+                        "email": email_field.value,
+                        "password": password_field.value
+                    }),
+                    op="auth.sign_in",
+                )
 
                 if response.user is None:
                     error_text.value = "Credenciales incorrectas"
-                    self.page.update()
                     return
 
                 self.user = response.user
 
-                profile = (
-                    supabase
-                    .table("profiles")
-                    .select("username")
-                    .eq("id", self.user.id)
-                    .single()
-                    .execute()
-                )
-
-                self.username = profile.data["username"]
+                username = self.profiles.get(self.user.id)
+                if username is None:
+                    profile = await run_session_db(
+                        self.db,
+                        self.db
+                        .table("profiles")
+                        .select("username")
+                        .eq("id", self.user.id)
+                        .single()
+                        .execute,
+                        op="profiles.select",
+                    )
+                    username = self.profiles[self.user.id] = profile.data["username"]
+
+                self.username = username
+                try:
+                    self.saved_game = await run_db(snapshot_writer.load, self.user.id)
+                except Exception as ex:
+                    # Sin la partida guardada se puede jugar igual
+                    print(f"Error loading snapshot: {ex}")
                 self.show_menu()
 
+            except asyncio.TimeoutError:
+                error_text.value = "El servidor tardó demasiado. Inténtalo de nuevo."
             except Exception as ex:
                 error_text.value = f"Error: {str(ex)}"
+            finally:
+                login_button.disabled = False
+                progress.visible = False
                 self.page.update()
 
+        login_button.on_click = login_click
+
         def go_to_register(e):
             self.show_register()
 
@@ -71,7 +276,8 @@ class TetrisApp:
                     email_field,
                     password_field,
                     error_text,
-                    ft.ElevatedButton("Iniciar Sesión", on_click=login_click, width=300),
+                    progress,
+                    login_button,
                     ft.TextButton("¿No tienes cuenta? Regístrate", on_click=go_to_register),
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -79,6 +285,7 @@ class TetrisApp:
         )
 
     def show_register(self):
+        self.last_activity = time.monotonic()
         self.page.clean()
 
         username_field = ft.TextField(label="Usuario", width=300)
@@ -86,32 +293,51 @@ class TetrisApp:
         password_field = ft.TextField(label="Contraseña", password=True, width=300)
         error_text = ft.Text("", color=ft.Colors.RED)
         success_text = ft.Text("", color=ft.Colors.GREEN)
-        
-        def register_click(e):
+        progress = ft.ProgressRing(width=24, height=24, visible=False)
+        register_button = ft.ElevatedButton("Registrarse", width=300)
+
+        async def register_click(e):
+            register_button.disabled = True
+            progress.visible = True
+            error_text.value = ""
+            self.page.update()
             try:
-                response = supabase.auth.sign_up({
-                    "email": email_field.value,
-                    "password": password_field.value
-                })
+                response = await run_db(
+                    lambda: self.session_db().auth.sign_up({
+                        "email": email_field.value,
+                        "password": password_field.value
+                    }),
+                    op="auth.sign_up",
+                )
 
                 if response.user is None:
                     error_text.value = "Error al crear usuario"
-                    self.page.update()
                     return
 
-                supabase.table("profiles").insert({
-                    "id": response.user.id,
-                    "username": username_field.value
-                }).execute()
+                await run_session_db(
+                    self.db,
+                    self.db.table("profiles").insert({
+                        "id": response.user.id,
+                        "username": username_field.value
+                    }).execute,
+                    op="profiles.insert",
+                )
+                self.profiles[response.user.id] = username_field.value
 
                 success_text.value = "Registro exitoso. Inicia sesión."
                 error_text.value = ""
-                self.page.update()
 
+            except asyncio.TimeoutError:
+                error_text.value = "El servidor tardó demasiado. Inténtalo de nuevo."
             except Exception as ex:
                 error_text.value = f"Error: {str(ex)}"
+            finally:
+                register_button.disabled = False
+                progress.visible = False
                 self.page.update()
 
+        register_button.on_click = register_click
+
         def go_to_login(e):
             self.show_login()
 
@@ -125,7 +351,8 @@ class TetrisApp:
                     password_field,
                     error_text,
                     success_text,
-                    ft.ElevatedButton("Registrarse", on_click=register_click, width=300),
+                    progress,
+                    register_button,
                     ft.TextButton("¿Ya tienes cuenta? Inicia Sesión", on_click=go_to_login),
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -133,18 +360,41 @@ class TetrisApp:
         )
 
     def show_menu(self):
+        self.last_activity = time.monotonic()
+        self.game = None
+        self.replay = None
+        self.stop_watching()
         self.page.clean()
 
         def play_click(e):
             self.start_game()
 
-        def leaderboard_click(e):
-            self.show_leaderboard()
+        def continue_click(e):
+            try:
+                game, replay = decode_session(self.saved_game)
+            except (ValueError, IndexError) as ex:
+                print(f"Error restoring snapshot: {ex}")
+                self.saved_game = None
+                snapshot_writer.discard(self.user.id)
+                self.show_menu()
+                return
+            self.start_game(game, replay)
+
+        async def leaderboard_click(e):
+            await self.show_leaderboard()
+
+        async def live_click(e):
+            self.show_live_games()
 
-        def logout_click(e):
-            supabase.auth.sign_out()
+        async def logout_click(e):
+            try:
+                # Solo esta sesión: las pestañas del mismo usuario siguen dentro
+                await run_session_db(self.db, self.db.auth.sign_out, {"scope": "local"}, op="auth.sign_out")
+            except Exception as ex:
+                print(f"Error signing out: {ex}")
             self.user = None
             self.username = ""
+            self.saved_game = None
             self.show_login()
 
         self.page.add(
@@ -158,201 +408,456 @@ class TetrisApp:
                     ),
                     ft.Text(" TETRIS GAME", size=50, weight=ft.FontWeight.BOLD),
                     ft.Container(height=20),
+                    ft.ElevatedButton(
+                        " CONTINUAR PARTIDA",
+                        on_click=continue_click,
+                        width=300,
+                        height=60,
+                        style=PLAY_STYLE,
+                        visible=self.saved_game is not None,
+                    ),
                     ft.ElevatedButton(
                         " JUGAR",
                         on_click=play_click,
                         width=300,
                         height=60,
-                        style=ft.ButtonStyle(
-                            color=ft.Colors.WHITE,
-                            bgcolor=ft.Colors.GREEN_700,
-                        ),
+                        style=PLAY_STYLE,
                     ),
                     ft.ElevatedButton(
                         " PARTIDAS",
                         on_click=leaderboard_click,
                         width=300,
                         height=60,
-                        style=ft.ButtonStyle(
-                            color=ft.Colors.WHITE,
-                            bgcolor=ft.Colors.BLUE_700,
-                        ),
+                        style=SCORES_STYLE,
+                    ),
+                    ft.ElevatedButton(
+                        " EN DIRECTO",
+                        on_click=live_click,
+                        width=300,
+                        height=60,
+                        style=SCORES_STYLE,
                     ),
                     ft.ElevatedButton(
                         " SALIR",
                         on_click=logout_click,
                         width=300,
                         height=60,
-                        style=ft.ButtonStyle(
-                            color=ft.Colors.WHITE,
-                            bgcolor=ft.Colors.RED_700,
-                        ),
+                        style=EXIT_STYLE,
                     ),
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             )
         )
 
-    def show_leaderboard(self):
+    async def show_leaderboard(self, view="mine"):
+        self.last_activity = time.monotonic()
         self.page.clean()
 
-        try:
-            response = (
-                supabase
-                .table("scores")
-                .select("score, level, created_at")
-                .eq("user_id", self.user.id)
-                .order("score", desc=True)
-                .limit(10)
-                .execute()
+        def back_click(e):
+            self.show_menu()
+
+        async def mine_click(e):
+            await self.show_leaderboard("mine")
+
+        async def global_click(e):
+            await self.show_leaderboard("global")
+
+        def leaderboard_row(idx, record):
+            cells = [
+                ft.Text(f"{idx}.", size=18, weight=ft.FontWeight.BOLD, width=40),
+                ft.Text(f"{record['score']} pts", size=18, width=120),
+                ft.Text(f"Nivel {record['level']}", size=16),
+            ]
+            if view == "global":
+                cells.insert(1, ft.Text(record["username"], size=16, width=120))
+            return ft.Container(
+                content=ft.Row(cells),
+                padding=10,
+                border=ROW_BORDER,
+                border_radius=10,
             )
 
-            leaderboard_items = []
+        leaderboard_list = ft.Column(
+            [ft.ProgressRing(), ft.Text("Cargando partidas...", size=16)],
+            scroll=ft.ScrollMode.AUTO,
+            height=400,
+        )
+        more_button = ft.ElevatedButton("Cargar más", width=300, visible=False)
+        rank_text = ft.Text("", size=16, color=ft.Colors.AMBER_400, visible=False)
 
-            if not response.data:
-                leaderboard_items.append(
-                    ft.Text("Aún no tienes partidas guardadas", size=18)
-                )
+        async def more_click(e):
+            more_button.disabled = True
+            self.page.update()
+            shown = len(leaderboard_list.controls)
+            try:
+                rows = await run_session_db(self.db, leaderboard_cache.user_page, self.db, self.user.id, shown)
+                for idx, record in enumerate(rows, shown + 1):
+                    leaderboard_list.controls.append(leaderboard_row(idx, record))
+                more_button.visible = leaderboard_cache.has_more(self.user.id, len(leaderboard_list.controls))
+            except Exception as ex:
+                print(f"Error loading more scores: {ex}")
+            more_button.disabled = False
+            self.page.update()
+
+        more_button.on_click = more_click
+
+        self.page.add(
+            ft.Column(
+                [
+                    ft.Text(
+                        "MIS MEJORES PARTIDAS" if view == "mine" else "TOP GLOBAL",
+                        size=36,
+                        weight=ft.FontWeight.BOLD,
+                    ),
+                    ft.Row(
+                        [
+                            ft.TextButton("MIS PARTIDAS", on_click=mine_click, disabled=view == "mine"),
+                            ft.TextButton("TOP GLOBAL", on_click=global_click, disabled=view == "global"),
+                        ],
+                        alignment=ft.MainAxisAlignment.CENTER,
+                    ),
+                    rank_text,
+                    leaderboard_list,
+                    more_button,
+                    ft.Container(height=20),
+                    ft.ElevatedButton("Volver al Menú", on_click=back_click, width=300),
+                ],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            )
+        )
+
+        try:
+            if view == "global":
+                records = await run_session_db(self.db, leaderboard_cache.global_top, self.db)
+                mine = leaderboard_cache.cached_user_top(self.user.id)
+                if mine:
+                    rank = await run_session_db(self.db, leaderboard_cache.rank, self.db, mine[0]["score"])
+                    rank_text.value = f"Tu mejor puesto: #{rank}"
+                    rank_text.visible = True
             else:
-                for idx, record in enumerate(response.data, 1):
-                    leaderboard_items.append(
-                        ft.Container(
-                            content=ft.Row(
-                                [
-                                    ft.Text(f"{idx}.", size=18, weight=ft.FontWeight.BOLD, width=40),
-                                    ft.Text(f"{record['score']} pts", size=18, width=120),
-                                    ft.Text(f"Nivel {record['level']}", size=16),
-                                ],
-                            ),
-                            padding=10,
-                            border=ft.border.all(1, ft.Colors.BLUE_700),
-                            border_radius=10,
-                        )
-                    )
+                # Si ya está en caché no hay consulta ni salto al pool de hilos
+                records = leaderboard_cache.cached_user_top(self.user.id)
+                if records is None:
+                    records = await run_session_db(self.db, leaderboard_cache.user_top, self.db, self.user.id)
+                more_button.visible = leaderboard_cache.has_more(self.user.id, min(len(records), TOP_N))
+
+            if not records:
+                leaderboard_items = [
+                    ft.Text("Aún no tienes partidas guardadas" if view == "mine" else "Aún no hay partidas", size=18)
+                ]
+            else:
+                leaderboard_items = [
+                    leaderboard_row(idx, record) for idx, record in enumerate(records[:TOP_N], 1)
+                ]
 
+        except asyncio.TimeoutError:
+            leaderboard_items = [
+                ft.Text("El servidor tardó demasiado en responder", color=ft.Colors.RED)
+            ]
         except Exception as ex:
             leaderboard_items = [
                 ft.Text(f"Error al cargar partidas: {str(ex)}", color=ft.Colors.RED)
             ]
 
+        leaderboard_list.controls = leaderboard_items
+        self.page.update()
+
+    def show_live_games(self):
+        self.last_activity = time.monotonic()
+        self.stop_watching()
+        self.page.clean()
+
         def back_click(e):
             self.show_menu()
 
+        async def refresh_click(e):
+            self.show_live_games()
+
+        def watch_click(channel):
+            async def handler(e):
+                self.watch_game(channel)
+            return handler
+
+        channels = sorted(spectator_hub.live(), key=lambda channel: channel.game.score, reverse=True)
+        rows = [
+            ft.Container(
+                content=ft.Row(
+                    [
+                        ft.Text(channel.username, size=16, width=120),
+                        ft.Text(f"{channel.game.score} pts", size=18, width=100),
+                        ft.Text(f"Nivel {channel.game.level}", size=16, width=80),
+                        ft.Text(f"👁 {len(channel.viewers)}", size=16, width=60),
+                        ft.ElevatedButton("VER", on_click=watch_click(channel)),
+                    ]
+                ),
+                padding=10,
+                border=ROW_BORDER,
+                border_radius=10,
+            )
+            for channel in channels[:LIVE_GAMES_SHOWN]
+        ]
+
         self.page.add(
             ft.Column(
                 [
-                    ft.Text("MIS MEJORES PARTIDAS", size=36, weight=ft.FontWeight.BOLD),
-                    ft.Container(height=20),
-                    ft.Column(leaderboard_items, scroll=ft.ScrollMode.AUTO, height=400),
+                    ft.Text("EN DIRECTO", size=36, weight=ft.FontWeight.BOLD),
+                    ft.Column(
+                        rows or [ft.Text("No hay partidas en curso", size=18)],
+                        scroll=ft.ScrollMode.AUTO,
+                        height=400,
+                    ),
                     ft.Container(height=20),
+                    ft.ElevatedButton("Actualizar", on_click=refresh_click, width=300),
                     ft.ElevatedButton("Volver al Menú", on_click=back_click, width=300),
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             )
         )
 
+    def watch_game(self, channel):
+        from renderers import create_renderer
+
+        self.last_activity = time.monotonic()
+        self.stop_watching()
+        self.page.clean()
+
+        renderer = create_renderer(SPECTATOR_RENDERER)
+        board_container = ft.Container(
+            width=BOARD_WIDTH * CELL_SIZE,
+            height=BOARD_HEIGHT * CELL_SIZE,
+            bgcolor=ft.Colors.BLACK,
+            border=BOARD_BORDER,
+            content=renderer.control,
+        )
+        score_text = ft.Text(f"Puntuación: {channel.game.score}", size=20, weight=ft.FontWeight.BOLD)
+        level_text = ft.Text(f"Nivel: {channel.game.level}", size=20)
+        status_text = ft.Text(f"Viendo a {channel.username}", size=16)
+        shown = [channel.game.score, channel.game.level, False]
+
+        def flush():
+            # Un solo envío por frame con todo lo fusionado desde el anterior
+            cells, state = spectator_hub.take(viewer)
+            if state is None:
+                return
+            self.last_activity = time.monotonic()
+            updates = renderer.render_cells(cells.items())
+            controls = [control for control, _, _ in updates]
+            if shown[0] != state.score:
+                shown[0] = state.score
+                score_text.value = f"Puntuación: {state.score}"
+                controls.append(score_text)
+            if shown[1] != state.level:
+                shown[1] = state.level
+                level_text.value = f"Nivel: {state.level}"
+                controls.append(level_text)
+            if channel.closed and not shown[2]:
+                shown[2] = True
+                status_text.value = "PARTIDA TERMINADA" if state.over else f"{channel.username} ha salido de la partida"
+                status_text.color = ft.Colors.RED
+                controls.append(status_text)
+            if controls:
+                self.page.update(*controls)
+
+        def back_click(e):
+            self.show_live_games()
+
+        scheduler.start(self.page.loop)
+        viewer = spectator_hub.watch(channel, flush)
+        if viewer is None:
+            # Terminó mientras se elegía
+            self.show_live_games()
+            return
+        self.viewer = viewer
 
-    def start_game(self):
-        self.game = TetrisGame()
+        self.page.add(
+            ft.Column(
+                [
+                    ft.Row(
+                        [
+                            ft.Container(
+                                content=score_text,
+                                expand=True,
+                            ),
+                            status_text,
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
+                    level_text,
+                    ft.Container(height=10),
+                    board_container,
+                    ft.Container(height=20),
+                    ft.ElevatedButton("Volver", on_click=back_click, width=300),
+                ],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            )
+        )
+
+    def start_game(self, game=None, replay=None):
+        # Fuera de la pantalla de login: no retrasan el arranque del servidor
+        from renderers import create_renderer
+        from replay import ReplayRecorder
+        from bot import best_placement, placement_cells
+
+        self.last_activity = time.monotonic()
+        if game is None:
+            game = TetrisGame()
+            replay = ReplayRecorder(game.seed)
+            if self.user:
+                # La partida nueva sustituye a la guardada
+                snapshot_writer.discard(self.user.id)
+        self.game = game
+        self.replay = replay
+        self.saved_game = None
         self.game_loop_running = True
         self.page.clean()
+        # Los espectadores reciben un delta por tick, calculado solo si hay alguno mirando
+        channel = self.channel = spectator_hub.open(self.username, game)
+
+        renderer = create_renderer()
 
         board_container = ft.Container(
             width=BOARD_WIDTH * CELL_SIZE,
             height=BOARD_HEIGHT * CELL_SIZE,
             bgcolor=ft.Colors.BLACK,
-            border=ft.border.all(2, ft.Colors.WHITE),
-            content=ft.Stack(
-                [],
-                width=BOARD_WIDTH * CELL_SIZE,
-                height=BOARD_HEIGHT * CELL_SIZE,
-            ),
+            border=BOARD_BORDER,
+            content=renderer.control,
         )
 
         score_text = ft.Text(f"Puntuación: {self.game.score}", size=20, weight=ft.FontWeight.BOLD)
         level_text = ft.Text(f"Nivel: {self.game.level}", size=20)
         username_text = ft.Text(f"Usuario: {self.username}", size=16)
+        hint_button = ft.ElevatedButton("PISTA", width=120)
         
+        shown = [game.score, game.level]
+        saved_at = [time.monotonic()]
+
+        # Modo pista: activado y pieza para la que se calculó la colocación sugerida
+        hint = [False, None]
+
+        def update_hint():
+            # Una búsqueda por pieza (<1 ms); mover la pieza no cambia el destino
+            piece = game.current_piece
+            if hint[1] is not piece:
+                hint[1] = piece
+                placement = best_placement(game)
+                renderer.hint = placement_cells(piece, placement) if placement else None
+
         def update_board():
-            cells = []
+            start = time.perf_counter() if metrics.METRICS_ENABLED else 0.0
+            if hint[0]:
+                update_hint()
+            # Solo viajan los controles que cambiaron; el resto del árbol no se recorre
+            updates = renderer.render(game)
+            controls = [control for control, _, _ in updates]
+            if shown[0] != game.score:
+                shown[0] = game.score
+                score_text.value = f"Puntuación: {game.score}"
+                controls.append(score_text)
+                updates.append((score_text, "value", score_text.value))
+            if shown[1] != game.level:
+                shown[1] = game.level
+                level_text.value = f"Nivel: {game.level}"
+                controls.append(level_text)
+                updates.append((level_text, "value", level_text.value))
+            if metrics.METRICS_ENABLED:
+                metrics.render_seconds.observe(time.perf_counter() - start)
+            if controls:
+                if metrics.METRICS_ENABLED:
+                    # {"i":"_123","attr":"valor"} por propiedad, como en el protocolo de Flet
+                    metrics.update_bytes.observe(
+                        sum(len(attr) + len(str(value)) + 18 for _, attr, value in updates)
+                    )
+                self.page.update(*controls)
+            spectator_hub.publish(channel)
 
-            # Dibujar tablero fijo
-            for y in range(BOARD_HEIGHT):
-                for x in range(BOARD_WIDTH):
-                    if self.game.board[y][x]:
-                        cells.append(
-                            ft.Container(
-                                left=x * CELL_SIZE,
-                                top=y * CELL_SIZE,
-                                width=CELL_SIZE - 1,
-                                height=CELL_SIZE - 1,
-                                bgcolor=self.game.board[y][x],
-                                border_radius=2,
-                            )
-                        )
-
-            # Dibujar pieza actual
-            if self.game.current_piece:
-                for x, y in self.game.current_piece.get_cells():
-                    if y >= 0:
-                        cells.append(
-                            ft.Container(
-                                left=x * CELL_SIZE,
-                                top=y * CELL_SIZE,
-                                width=CELL_SIZE - 1,
-                                height=CELL_SIZE - 1,
-                                bgcolor=self.game.current_piece.color,
-                                border_radius=2,
-                            )
-                        )
-
-            board_container.content = ft.Stack(cells)
-            score_text.value = f"Puntuación: {self.game.score}"
-            level_text.value = f"Nivel: {self.game.level}"
-            self.page.update()
+        inputs = deque()
 
-        def move_left(e):
-            if self.game and not self.game.game_over:
-                self.game.move_piece(-1, 0)
-                update_board()
+        def handle_input(action):
+            # Se encola en orden; el planificador lo aplica en el próximo frame
+            if self.game is game and not game.game_over and len(inputs) < MAX_QUEUED_INPUTS:
+                self.last_activity = time.monotonic()
+                inputs.append(action)
+                scheduler.request_frame(timer)
 
-        def move_right(e):
-            if self.game and not self.game.game_over:
-                self.game.move_piece(1, 0)
-                update_board()
+        async def move_left(e):
+            handle_input('left')
 
-        def rotate(e):
-            if self.game and not self.game.game_over:
-                self.game.rotate_piece()
-                update_board()
+        async def move_right(e):
+            handle_input('right')
 
-        def move_down(e):
-            if self.game and not self.game.game_over:
-                self.game.move_piece(0, 1)
-                update_board()
+        async def rotate(e):
+            handle_input('rotate')
 
-        def hard_drop(e):
-            if self.game and not self.game.game_over:
-                self.game.hard_drop()
-                update_board()
+        async def move_down(e):
+            handle_input('down')
+
+        async def hard_drop(e):
+            handle_input('drop')
 
-        def pause_game(e):
-            self.game_loop_running = False
+        async def pause_game(e):
+            self.stop_game_loop()
+            self.save_game()
             self.show_menu()
 
-        async def game_loop():
-            while self.game_loop_running and not self.game.game_over:
-                await asyncio.sleep(max(0.6 - self.game.level * 0.08, 0.08))
-                if self.game and not self.game.game_over:
-                    self.game.drop_piece()
-                    update_board()
+        async def toggle_hint(e):
+            if self.game is not game or game.game_over:
+                return
+            hint[0] = not hint[0]
+            hint[1] = None
+            if not hint[0]:
+                renderer.hint = None
+            hint_button.text = "SIN PISTA" if hint[0] else "PISTA"
+            self.page.update(hint_button)
+            scheduler.request_frame(timer)
+
+        async def on_keyboard(e: ft.KeyboardEvent):
+            # Mantener la tecla pulsada repite el evento en el cliente
+            action = KEY_ACTIONS.get(e.key)
+            if action:
+                handle_input(action)
+            elif e.key == "Escape" and self.game is game:
+                await pause_game(e)
+            elif e.key == "H":
+                await toggle_hint(e)
+
+        # La gravedad la mueve el planificador común: tick avanza la partida y
+        # flush aplica las entradas pendientes y envía el estado una vez por lote
+        def gravity_tick():
+            if not game.game_over:
+                game.drop_piece()
+                replay.gravity()
+                timer.interval = gravity_interval(game.level)
+
+        def flush():
+            while inputs and not game.game_over:
+                action = inputs.popleft()
+                game.apply_input(action)
+                replay.record(action)
+            timer.interval = gravity_interval(game.level)
+
+            now = time.monotonic()
+            if now - self.last_activity > SESSION_IDLE_TIMEOUT:
+                self.expire()
+            elif game.game_over:
+                self.stop_game_loop()
+                if self.game is game:
+                    if self.user:
+                        snapshot_writer.discard(self.user.id)
+                    self.show_trivia_question()
+            else:
+                update_board()
+                if now - saved_at[0] >= SNAPSHOT_INTERVAL and self.game is game:
+                    saved_at[0] = now
+                    self.save_game()
 
-            if self.game.game_over:
-                self.game_loop_running = False
-                self.show_trivia_question()
+        renderer.render(game)
 
-        update_board()
+        scheduler.start(self.page.loop)
+        timer = scheduler.schedule(gravity_tick, flush, gravity_interval(game.level))
+        self.timer = timer
 
+        hint_button.on_click = toggle_hint
+        self.page.on_keyboard_event = on_keyboard
         self.page.add(
             ft.Column(
                 [
@@ -385,13 +890,17 @@ class TetrisApp:
                         ],
                         alignment=ft.MainAxisAlignment.CENTER,
                     ),
-                    ft.ElevatedButton("MENU", on_click=pause_game, width=250),
+                    ft.Row(
+                        [
+                            hint_button,
+                            ft.ElevatedButton("MENU", on_click=pause_game, width=120),
+                        ],
+                        alignment=ft.MainAxisAlignment.CENTER,
+                    ),
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             )
         )
-
-        self.page.run_task(game_loop)
     
     async def continue_after_correct(self):
         await asyncio.sleep(2)
@@ -402,20 +911,12 @@ class TetrisApp:
         self.show_game_over(True)
 
     def show_trivia_question(self):
+        self.last_activity = time.monotonic()
         self.page.clean()
 
-        try:
-            response = supabase.table("questions").select("*").execute()
-            questions = response.data
-
-            if questions:
-                self.current_question = random.choice(questions)
-            else:
-                self.show_game_over(True)
-                return
-
-        except Exception as ex:
-            self.show_game_over(False)
+        self.current_question = question_cache.pick(self.user.id)
+        if self.current_question is None:
+            self.show_game_over(True)
             return
 
         question_text = ft.Text(
@@ -495,15 +996,24 @@ class TetrisApp:
         if not save_score:
             final_score = 0
 
+        save_text = ft.Text("", size=16)
+
+        metrics.games_finished.inc()
+
         if save_score and final_score > 0:
-            try:
-                supabase.table("scores").insert({
-                    "user_id": self.user.id,
-                    "score": final_score,
-                    "level": final_level
-                }).execute()
-            except Exception as ex:
-                print(f"Error saving score: {ex}")
+            # Se guarda en la cola local; el escritor en segundo plano la sube por lotes
+            record = {
+                "score": final_score,
+                "level": final_level,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            }
+            score_writer.enqueue({
+                "user_id": self.user.id,
+                **record,
+                "replay": base64.b64encode(self.replay.finish()).decode(),
+            })
+            leaderboard_cache.record_score(self.user.id, record)
+            save_text.value = "Puntuación guardada"
 
         def menu_click(e):
             self.show_menu()
@@ -515,6 +1025,7 @@ class TetrisApp:
                     ft.Container(height=20),
                     ft.Text(f"Puntuación Final: {final_score}", size=30),
                     ft.Text(f"Nivel Alcanzado: {final_level}", size=24),
+                    save_text,
                     ft.Container(height=40),
                     ft.ElevatedButton("Volver al Menú", on_click=menu_click, width=300, height=60),
                 ],
@@ -522,15 +1033,34 @@ class TetrisApp:
             )
         )
         
-def main(page: ft.Page):
+async def main(page: ft.Page):
+    # En el bucle de eventos: reap_idle_sessions puede guardar partidas de otras sesiones
     TetrisApp(page)
+    # Tras servir el primer login: el SDK de Supabase y las preguntas se cargan en
+    # segundo plano mientras el usuario escribe, sin competir con el arranque.
+    # score_writer arranca antes, pero solo crea su cliente si hay filas pendientes
+    question_cache.start()
+
+
+def save_all_games():
+    # Al parar la máquina (despliegue, auto-stop) se guardan las partidas que siguen abiertas
+    for app in list(sessions):
+        try:
+            app.save_game()
+        except Exception as ex:
+            print(f"Error saving game at exit: {ex}")
 
-ft.app(
-    target=main,
-    view=ft.AppView.WEB_BROWSER,
-    host="0.0.0.0",
-    port=int(os.environ.get("PORT", 8080)),
-)
 
 if __name__ == "__main__":
-    ft.app(target=main)
+    score_writer.start()
+    snapshot_writer.start()
+    # atexit ejecuta en orden inverso: primero se guardan las partidas y luego se escriben
+    atexit.register(save_all_games)
+    metrics.start_server()
+
+    ft.app(
+        target=main,
+        view=ft.AppView.WEB_BROWSER,
+        host="0.0.0.0",
+        port=int(os.environ.get("PORT", 8080)),
+    )
@@ -0,0 +1,198 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+# Métricas en formato de texto de Prometheus en http://0.0.0.0:METRICS_PORT/metrics.
+# Con METRICS_ENABLED=0 cada observación vuelve de inmediato, para comparar el coste
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9091))
+
+# Límites en segundos: de 10 µs (un tick) a 10 s (el timeout de Supabase)
+TIME_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 65536)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry: List["Metric"] = []
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in key]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets=TIME_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # Por etiqueta: [cuentas por cubeta (sin acumular) + desbordamiento, suma]
+        self._values: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        lines = []
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, read: Callable[[], float]):
+        # Se lee en el momento del scrape: no cuesta nada en el camino caliente
+        super().__init__(name, help_text)
+        self.read = read
+
+    def samples(self):
+        return [f"{self.name} {self.read()}"]
+
+
+class CounterFunc(Gauge):
+    kind = "counter"
+
+
+def render() -> str:
+    blocks = []
+    for metric in _registry:
+        try:
+            blocks.append(metric.render())
+        except Exception as ex:
+            blocks.append(f"# {metric.name}: {ex}")
+    return "\n".join(blocks) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port: int = METRICS_PORT):
+    if not METRICS_ENABLED:
+        return None
+    server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
+
+
+# Métricas compartidas por los módulos del servidor
+tick_seconds = Histogram("tetris_tick_seconds", "Duración de un tick de gravedad de una sesión")
+tick_lateness_seconds = Histogram(
+    "tetris_tick_lateness_seconds", "Retraso de cada tick de gravedad respecto a su plazo"
+)
+flush_seconds = Histogram(
+    "tetris_flush_seconds", "Entradas, render y page.update() de una sesión en un lote del planificador"
+)
+render_seconds = Histogram("tetris_render_seconds", "Construcción de la actualización del tablero (update_board)")
+update_bytes = Histogram(
+    "tetris_update_bytes", "Tamaño estimado de las propiedades enviadas por page.update()", SIZE_BUCKETS
+)
+db_seconds = Histogram("tetris_db_seconds", "Latencia de las llamadas a Supabase")
+db_errors = Counter("tetris_db_errors_total", "Llamadas a Supabase fallidas o agotadas")
+games_finished = Counter("tetris_games_finished_total", "Partidas terminadas")
+scores_parked = Counter(
+    "tetris_scores_parked_total", "Puntuaciones rechazadas por Supabase y apartadas en la cola local"
+)
+
+
+@contextmanager
+def db_call(op: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        db_errors.inc(op=op)
+        raise
+    finally:
+        db_seconds.observe(time.perf_counter() - start, op=op)
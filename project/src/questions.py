@@ -0,0 +1,80 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from metrics import db_call
+from supabase_client import get_client
+
+QUESTIONS_TTL = float(os.environ.get("QUESTIONS_TTL", 600))
+RECENT_PER_USER = 10
+MAX_TRACKED_USERS = 5000
+
+
+class QuestionCache:
+    def __init__(self, ttl: float = QUESTIONS_TTL, recent_per_user: int = RECENT_PER_USER):
+        self.ttl = ttl
+        self.recent_per_user = recent_per_user
+        # Tupla inmutable: se reemplaza entera al refrescar, nunca se modifica
+        self.questions = ()
+        self.loaded_at = 0.0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._thread = None
+
+    def load(self) -> bool:
+        try:
+            with db_call("questions.select"):
+                response = get_client().table("questions").select("*").execute()
+        except Exception as ex:
+            # Si Supabase falla o tarda, se sigue sirviendo el pool anterior
+            print(f"Error loading questions: {ex}")
+            return False
+        if not response.data:
+            # Sin sesión de usuario RLS devuelve la tabla vacía si falta la política de
+            # lectura anónima (supabase/migrations/20261017140000_questions_anon_read.sql)
+            print("Error loading questions: no rows returned (check the questions RLS policy)")
+            return False
+        self.questions = tuple(response.data)
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+        return True
+
+    def start(self):
+        # Se llama en cada sesión nueva: solo la primera lanza el hilo
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._refresh_loop, name="question-cache", daemon=True)
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            if not self.load():
+                # Reintenta antes si la carga falló
+                time.sleep(min(self.ttl, 30))
+                continue
+            time.sleep(self.ttl)
+
+    def pick(self, user_id) -> Optional[dict]:
+        questions = self.questions
+        if not questions:
+            return None
+
+        with self._lock:
+            recent = self._recent.pop(user_id, None)
+            if recent is None:
+                recent = deque(maxlen=min(self.recent_per_user, len(questions) - 1) or 1)
+            self._recent[user_id] = recent
+            if len(self._recent) > MAX_TRACKED_USERS:
+                self._recent.popitem(last=False)
+
+            fresh = [q for q in questions if q["id"] not in recent]
+            question = random.choice(fresh or questions)
+            recent.append(question["id"])
+        return question
+
+
+question_cache = QuestionCache()
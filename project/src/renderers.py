@@ -0,0 +1,200 @@
+import base64
+import os
+import struct
+import zlib
+from typing import List, Tuple
+
+import flet as ft
+import flet.canvas as cv
+
+from tetris_game import BOARD_WIDTH, BOARD_HEIGHT, CELL_SIZE, PALETTE, HINT_COLOR_ID
+
+RENDERER_ENV = "TETRIS_RENDERER"
+DEFAULT_RENDERER = "canvas"
+
+BOARD_CELLS = BOARD_WIDTH * BOARD_HEIGHT
+# Frames codificados recientes: los espectadores de una partida comparten el mismo PNG
+ENCODED_FRAMES = 64
+
+
+class BoardRenderer:
+    __slots__ = ('ghost', 'hint', 'frame', 'drawn', 'control')
+    name = ""
+
+    def __init__(self, ghost: bool = True):
+        self.ghost = ghost
+        # Celdas de la colocación sugerida (modo pista) o None
+        self.hint = None
+        self.frame = bytearray(BOARD_CELLS)
+        self.drawn = bytearray(BOARD_CELLS)
+        self.control = self.build()
+
+    def build(self) -> ft.Control:
+        raise NotImplementedError
+
+    def apply(self, changed: List[int]) -> List[Tuple[ft.Control, str, object]]:
+        raise NotImplementedError
+
+    def render(self, game) -> List[Tuple[ft.Control, str, object]]:
+        # Devuelve las propiedades modificadas que viajarán en el próximo page.update()
+        game.draw_frame(self.frame, self.ghost)
+        frame = self.frame
+        if self.hint:
+            # Por debajo de la pieza y de su fantasma
+            for i in self.hint:
+                if not frame[i]:
+                    frame[i] = HINT_COLOR_ID
+        drawn = self.drawn
+        if frame == drawn:
+            return []
+        changed = [i for i in range(BOARD_CELLS) if frame[i] != drawn[i]]
+        drawn[:] = frame
+        return self.apply(changed)
+
+    def render_cells(self, cells) -> List[Tuple[ft.Control, str, object]]:
+        # Celdas ya calculadas por otro (modo espectador): pares (celda, id de PALETTE),
+        # sin redibujar ni comparar el tablero entero
+        frame, drawn = self.frame, self.drawn
+        changed = []
+        for i, color in cells:
+            if drawn[i] != color:
+                frame[i] = drawn[i] = color
+                changed.append(i)
+        return self.apply(changed) if changed else []
+
+
+class ContainerRenderer(BoardRenderer):
+    __slots__ = ('cells',)
+    name = "containers"
+
+    def build(self) -> ft.Control:
+        self.cells = [
+            ft.Container(
+                left=x * CELL_SIZE,
+                top=y * CELL_SIZE,
+                width=CELL_SIZE - 1,
+                height=CELL_SIZE - 1,
+                border_radius=2,
+            )
+            for y in range(BOARD_HEIGHT)
+            for x in range(BOARD_WIDTH)
+        ]
+        return ft.Stack(
+            self.cells,
+            width=BOARD_WIDTH * CELL_SIZE,
+            height=BOARD_HEIGHT * CELL_SIZE,
+        )
+
+    def apply(self, changed):
+        updates = []
+        for i in changed:
+            cell = self.cells[i]
+            cell.bgcolor = PALETTE[self.frame[i]]
+            updates.append((cell, "bgcolor", cell.bgcolor))
+        return updates
+
+
+# Pinturas compartidas por todas las sesiones (0 = celda vacía)
+PAINTS = [ft.Paint(color=color or ft.Colors.TRANSPARENT) for color in PALETTE]
+
+
+class CanvasRenderer(BoardRenderer):
+    __slots__ = ('rects',)
+    name = "canvas"
+
+    def build(self) -> ft.Control:
+        self.rects = [
+            cv.Rect(
+                x * CELL_SIZE,
+                y * CELL_SIZE,
+                CELL_SIZE - 1,
+                CELL_SIZE - 1,
+                border_radius=2,
+                paint=PAINTS[0],
+            )
+            for y in range(BOARD_HEIGHT)
+            for x in range(BOARD_WIDTH)
+        ]
+        return cv.Canvas(
+            self.rects,
+            width=BOARD_WIDTH * CELL_SIZE,
+            height=BOARD_HEIGHT * CELL_SIZE,
+        )
+
+    def apply(self, changed):
+        updates = []
+        for i in changed:
+            rect = self.rects[i]
+            rect.paint = PAINTS[self.frame[i]]
+            updates.append((rect, "paint", PALETTE[self.frame[i]]))
+        return updates
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+_PNG_HEADER = (
+    b"\x89PNG\r\n\x1a\n"
+    + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", BOARD_WIDTH, BOARD_HEIGHT, 8, 3, 0, 0, 0))
+    + _png_chunk(
+        b"PLTE",
+        b"".join(bytes.fromhex((color or "#000000")[1:]) for color in PALETTE),
+    )
+)
+_PNG_END = _png_chunk(b"IEND", b"")
+
+
+def encode_frame_png(frame: bytearray) -> bytes:
+    # PNG indexado de 1 píxel por celda; el cliente lo escala sin suavizado
+    raw = b"".join(
+        b"\x00" + frame[y * BOARD_WIDTH:(y + 1) * BOARD_WIDTH] for y in range(BOARD_HEIGHT)
+    )
+    return _PNG_HEADER + _png_chunk(b"IDAT", zlib.compress(raw, 9)) + _PNG_END
+
+
+_encoded_frames = {}
+
+
+def encode_frame_base64(frame: bytearray) -> str:
+    key = bytes(frame)
+    data = _encoded_frames.get(key)
+    if data is None:
+        if len(_encoded_frames) >= ENCODED_FRAMES:
+            _encoded_frames.clear()
+        data = _encoded_frames[key] = base64.b64encode(encode_frame_png(frame)).decode()
+    return data
+
+
+class ImageRenderer(BoardRenderer):
+    __slots__ = ('image',)
+    name = "image"
+
+    def build(self) -> ft.Control:
+        self.image = ft.Image(
+            src_base64=encode_frame_base64(self.frame),
+            width=BOARD_WIDTH * CELL_SIZE,
+            height=BOARD_HEIGHT * CELL_SIZE,
+            fit=ft.ImageFit.FILL,
+            filter_quality=ft.FilterQuality.NONE,
+            gapless_playback=True,
+        )
+        return self.image
+
+    def apply(self, changed):
+        self.image.src_base64 = encode_frame_base64(self.frame)
+        return [(self.image, "src_base64", self.image.src_base64)]
+
+
+RENDERERS = {
+    ContainerRenderer.name: ContainerRenderer,
+    CanvasRenderer.name: CanvasRenderer,
+    ImageRenderer.name: ImageRenderer,
+}
+
+
+def create_renderer(name: str = None) -> BoardRenderer:
+    name = name or os.environ.get(RENDERER_ENV, DEFAULT_RENDERER)
+    if name not in RENDERERS:
+        raise ValueError(f"Renderer desconocido: {name} (opciones: {', '.join(RENDERERS)})")
+    return RENDERERS[name]()
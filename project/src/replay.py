@@ -0,0 +1,230 @@
+"""Grabación compacta de partidas y verificación de puntuaciones.
+
+Formato binario (versión 1):
+    b'TRP' | versión (1 byte) | semilla (varint) | eventos...
+
+Cada evento es un varint (delta_tick << 3) | código, donde delta_tick es el
+número de ticks de gravedad desde el evento anterior y código es el índice en
+INPUTS, o END al final de la partida. La mayoría de los eventos ocupan 1 byte.
+
+Uso: python -m replay verify replays.jsonl [--workers N]
+     python -m replay verify --from-db [--workers N]
+
+Cada línea del fichero es {"id": ..., "score": ..., "replay": base64}. Las
+partidas se re-simulan sin interfaz y se informa de cada puntuación que no
+coincide con la de su replay; las puntuaciones sin replay (insertadas sin pasar
+por el juego) no se pueden verificar y se informan como fallidas. --from-db lee
+todas las filas de scores con la service role key (SUPABASE_SERVICE_ROLE_KEY):
+con la clave anónima RLS no devuelve ninguna. Sale con 1 si alguna puntuación
+no coincide o no tiene replay y con 2 si no se pudo leer ninguna.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+
+from tetris_game import TetrisGame, INPUTS
+
+MAGIC = b'TRP'
+VERSION = 1
+INPUT_CODES = {action: code for code, action in enumerate(INPUTS)}
+END = 7
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Replay truncado")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class ReplayRecorder:
+    __slots__ = ('seed', 'tick', 'last_tick', 'events')
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.tick = 0
+        self.last_tick = 0
+        self.events = bytearray()
+
+    def gravity(self):
+        self.tick += 1
+
+    def record(self, action: str):
+        self._event(INPUT_CODES[action])
+
+    def _event(self, code: int):
+        _write_varint(self.events, (self.tick - self.last_tick) << 3 | code)
+        self.last_tick = self.tick
+
+    def snapshot(self) -> bytes:
+        # Replay en curso (sin END) para retomarlo en otra sesión: cabecera, ticks
+        # desde el último evento y los eventos tal cual
+        data = bytearray(MAGIC)
+        data.append(VERSION)
+        _write_varint(data, self.seed)
+        _write_varint(data, self.tick - self.last_tick)
+        return bytes(data + self.events)
+
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> 'ReplayRecorder':
+        seed, pos = _read_header(data)
+        pending, pos = _read_varint(data, pos)
+        recorder = cls(seed)
+        recorder.tick = pending
+        recorder.events = bytearray(data[pos:])
+        return recorder
+
+    def finish(self) -> bytes:
+        header = bytearray(MAGIC)
+        header.append(VERSION)
+        _write_varint(header, self.seed)
+        end = bytearray()
+        _write_varint(end, (self.tick - self.last_tick) << 3 | END)
+        return bytes(header + self.events + end)
+
+
+def _read_header(data: bytes) -> Tuple[int, int]:
+    # Longitud antes que nada: un replay truncado es ValueError, no IndexError
+    if len(data) <= len(MAGIC) or data[:3] != MAGIC:
+        raise ValueError("No es un replay de Tetris")
+    if data[3] != VERSION:
+        raise ValueError(f"Versión de replay no soportada: {data[3]}")
+    return _read_varint(data, 4)
+
+
+def decode(data: bytes) -> Tuple[int, List[Tuple[int, int]]]:
+    seed, pos = _read_header(data)
+    events = []
+    tick = 0
+    while pos < len(data):
+        value, pos = _read_varint(data, pos)
+        tick += value >> 3
+        events.append((tick, value & 7))
+    if not events or events[-1][1] != END:
+        raise ValueError("Replay truncado")
+    return seed, events
+
+
+def replay_game(data: bytes) -> TetrisGame:
+    seed, events = decode(data)
+    game = TetrisGame(seed)
+    tick = 0
+    for event_tick, code in events:
+        while tick < event_tick and not game.game_over:
+            game.drop_piece()
+            tick += 1
+        if code == END or game.game_over:
+            break
+        game.apply_input(INPUTS[code])
+    return game
+
+
+def verify(data: bytes, claimed_score: int) -> Tuple[bool, int]:
+    game = replay_game(data)
+    return game.score == claimed_score, game.score
+
+
+def _verify_record(record: dict) -> dict:
+    if not record.get('replay'):
+        return {'id': record.get('id'), 'ok': False, 'claimed': record.get('score'), 'error': "sin replay"}
+    try:
+        ok, score = verify(base64.b64decode(record['replay']), record['score'])
+        return {'id': record['id'], 'ok': ok, 'claimed': record['score'], 'replayed': score}
+    except (ValueError, IndexError, KeyError, TypeError) as ex:
+        return {'id': record.get('id'), 'ok': False, 'claimed': record.get('score'), 'error': str(ex)}
+
+
+def _records_from_file(path: str) -> Iterator[dict]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _records_from_db(service_key: str, page_size: int = 1000) -> Iterator[dict]:
+    from supabase_client import create_session_client
+
+    client = create_session_client(service_key)
+    start = 0
+    while True:
+        response = (
+            client
+            .table("scores")
+            # También las filas sin replay: una puntuación insertada a mano debe salir en el informe
+            .select("id, score, replay")
+            .order("created_at")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        yield from response.data
+        if len(response.data) < page_size:
+            return
+        start += page_size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verificación de puntuaciones a partir de replays")
+    sub = parser.add_subparsers(dest='command', required=True)
+    verify_parser = sub.add_parser('verify')
+    verify_parser.add_argument('path', nargs='?')
+    verify_parser.add_argument('--from-db', action='store_true')
+    verify_parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    if not args.path and not args.from_db:
+        parser.error("indica un fichero JSONL o --from-db")
+    if args.from_db:
+        service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if not service_key:
+            parser.error("--from-db necesita SUPABASE_SERVICE_ROLE_KEY (con la clave anónima RLS no devuelve filas)")
+        records = _records_from_db(service_key)
+    else:
+        records = _records_from_file(args.path)
+
+    start = time.perf_counter()
+    checked = 0
+    flagged = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for result in executor.map(_verify_record, records, chunksize=64):
+                checked += 1
+                if not result['ok']:
+                    flagged += 1
+                    print(json.dumps(result))
+    except Exception as ex:
+        # Sin todos los replays el resultado no vale como verificación
+        print(f"Error leyendo replays tras {checked}: {ex}", file=sys.stderr)
+        sys.exit(2)
+    if not checked:
+        print("Ninguna puntuación que verificar", file=sys.stderr)
+        sys.exit(2)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{checked} puntuaciones verificadas en {elapsed:.2f} s "
+        f"({checked / elapsed * 60:.0f}/min), {flagged} con diferencias o sin replay",
+        file=sys.stderr,
+    )
+    sys.exit(1 if flagged else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import asyncio
+import threading
+import time
+from typing import Callable, List, Optional
+
+from metrics import METRICS_ENABLED, tick_seconds, tick_lateness_seconds, flush_seconds
+
+# Granularidad de la rueda: los plazos se alinean a ranuras de este tamaño, así que
+# todas las sesiones con el mismo intervalo de gravedad vencen en el mismo lote
+TICK_RESOLUTION = 0.01
+WHEEL_SLOTS = 128
+# Ticks atrasados que se recuperan de golpe antes de resincronizar el plazo
+MAX_CATCH_UP = 5
+# Las entradas se aplican en frames comunes a todas las sesiones (50 por segundo)
+FRAME_INTERVAL = 0.02
+
+
+def gravity_interval(level: int) -> float:
+    return max(0.6 - level * 0.08, 0.08)
+
+
+class Timer:
+    __slots__ = ('tick', 'flush', 'interval', 'deadline', 'active')
+
+    def __init__(self, tick: Callable[[], None], flush: Callable[[], None], interval: float, deadline: int):
+        self.tick = tick
+        self.flush = flush
+        # Segundos entre ticks; tick puede cambiarlo (subida de nivel)
+        self.interval = interval
+        # Número de ranura en la que vence (entero: sin error acumulado)
+        self.deadline = deadline
+        self.active = True
+
+    def cancel(self):
+        self.active = False
+
+
+class TickScheduler:
+    def __init__(self, resolution: float = TICK_RESOLUTION, slots: int = WHEEL_SLOTS):
+        self.resolution = resolution
+        self._wheel: List[List[Timer]] = [[] for _ in range(slots)]
+        self._cursor = self._slot(time.monotonic())
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._sleep_until = float('inf')
+        self._frames = set()
+        self._frame_deadline = None
+        self._frame_steps = self._steps(FRAME_INTERVAL)
+        self.timers = 0
+        self.wakeups = 0
+        self.ticks = 0
+        self.resyncs = 0
+        self.frames = 0
+
+    def _slot(self, t: float) -> int:
+        # Margen para que despertar justo en el inicio de una ranura cuente como dentro de ella
+        return int(t / self.resolution + 1e-6)
+
+    def _steps(self, interval: float) -> int:
+        return max(1, round(interval / self.resolution))
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = loop
+        asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def schedule(self, tick: Callable[[], None], flush: Callable[[], None], interval: float) -> Timer:
+        # tick avanza la lógica de un tick; flush envía el resultado una sola vez por lote
+        timer = Timer(tick, flush, interval, self._slot(time.monotonic()) + 1 + self._steps(interval))
+        with self._lock:
+            self._insert(timer)
+            self.timers += 1
+            wake = timer.deadline * self.resolution < self._sleep_until
+        if wake and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify)
+        return timer
+
+    def frame_timer(self, flush: Callable[[], None]) -> Timer:
+        # Sin gravedad (espectadores): no entra en la rueda y solo se ejecuta en los frames que pida
+        return Timer(None, flush, 0.0, 0)
+
+    def request_frame(self, timer: Timer):
+        # flush se ejecutará en el próximo frame, una sola vez aunque lleguen varias entradas
+        with self._lock:
+            if not timer.active or timer in self._frames:
+                return
+            self._frames.add(timer)
+            if self._frame_deadline is not None:
+                return
+            current = self._slot(time.monotonic())
+            self._frame_deadline = (current // self._frame_steps + 1) * self._frame_steps
+            wake = self._frame_deadline * self.resolution < self._sleep_until
+        if wake and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def _insert(self, timer: Timer):
+        self._wheel[max(timer.deadline, self._cursor) % len(self._wheel)].append(timer)
+
+    def _collect(self, now: int) -> List[Timer]:
+        # Recorre las ranuras vencidas desde la última pasada (como mucho una vuelta)
+        due = []
+        wheel = self._wheel
+        size = len(wheel)
+        for slot in range(self._cursor, min(now, self._cursor + size - 1) + 1):
+            timers = wheel[slot % size]
+            if not timers:
+                continue
+            keep = []
+            for timer in timers:
+                if not timer.active:
+                    self.timers -= 1
+                elif timer.deadline <= now:
+                    due.append(timer)
+                else:
+                    keep.append(timer)
+            wheel[slot % size] = keep
+        self._cursor = now
+        return due
+
+    def _next_deadline(self) -> float:
+        # Primera ranura con un plazo de esta vuelta; los de vueltas posteriores solo cuentan al final
+        wheel = self._wheel
+        size = len(wheel)
+        later = float('inf')
+        span = size
+        if self._frame_deadline is not None:
+            # Más allá del próximo frame no hace falta buscar
+            span = max(1, min(size, self._frame_deadline - self._cursor + 1))
+        for offset in range(span):
+            slot = self._cursor + offset
+            for timer in wheel[slot % size]:
+                if not timer.active:
+                    continue
+                if timer.deadline <= slot:
+                    return timer.deadline * self.resolution
+                later = min(later, timer.deadline * self.resolution)
+        if self._frame_deadline is not None:
+            later = min(later, self._frame_deadline * self.resolution)
+        return later
+
+    def run_due(self, now: float) -> int:
+        current = self._slot(now)
+        with self._lock:
+            due = self._collect(current)
+            frames = ()
+            if self._frame_deadline is not None and self._frame_deadline <= current:
+                frames = self._frames
+                self._frames = set()
+                self._frame_deadline = None
+                self.frames += 1
+
+        for timer in due:
+            fired = 0
+            if METRICS_ENABLED:
+                tick_lateness_seconds.observe(max(0.0, now - timer.deadline * self.resolution))
+            # El plazo avanza en múltiplos del intervalo: un tick lento no desplaza los siguientes
+            while timer.active and timer.deadline <= current and fired < MAX_CATCH_UP:
+                start = time.perf_counter() if METRICS_ENABLED else 0.0
+                try:
+                    timer.tick()
+                except Exception as ex:
+                    print(f"Error in scheduled tick: {ex}")
+                    timer.cancel()
+                if METRICS_ENABLED:
+                    tick_seconds.observe(time.perf_counter() - start)
+                timer.deadline += self._steps(timer.interval)
+                fired += 1
+            if timer.deadline <= current:
+                timer.deadline = current + self._steps(timer.interval)
+                self.resyncs += 1
+            self.ticks += fired
+
+        # Un solo envío por sesión y lote, aunque haya recuperado varios ticks o entradas
+        flushes = list(due)
+        if frames:
+            ticked = set(due)
+            flushes.extend(timer for timer in frames if timer not in ticked)
+        for timer in flushes:
+            if not timer.active:
+                continue
+            start = time.perf_counter() if METRICS_ENABLED else 0.0
+            try:
+                timer.flush()
+            except Exception as ex:
+                print(f"Error flushing scheduled tick: {ex}")
+                timer.cancel()
+            if METRICS_ENABLED:
+                flush_seconds.observe(time.perf_counter() - start)
+
+        with self._lock:
+            for timer in due:
+                if timer.active:
+                    self._insert(timer)
+                else:
+                    self.timers -= 1
+        return len(due)
+
+    async def _run(self):
+        self._wake = asyncio.Event()
+        while True:
+            self.run_due(time.monotonic())
+            with self._lock:
+                self._sleep_until = self._next_deadline()
+                delay = self._sleep_until - time.monotonic()
+            self._wake.clear()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), None if delay == float('inf') else delay)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeups += 1
+
+
+scheduler = TickScheduler()
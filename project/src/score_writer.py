@@ -0,0 +1,187 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Tuple
+
+import metrics
+from metrics import db_call
+from supabase_client import create_session_client
+
+SCORE_SPOOL_PATH = os.getenv(
+    "SCORE_SPOOL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "score_spool.db"),
+)
+# Obligatoria: las puntuaciones se suben cuando el usuario ya puede haber cerrado la
+# pestaña o la sesión (o tras reiniciar la máquina), así que no hay token suyo con el
+# que pasar RLS. Con ella las filas de varios usuarios van en un único insert
+SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+BATCH_SIZE = 100
+MAX_BACKOFF = 60.0
+IDLE_WAIT = 5.0
+EXIT_FLUSH_TIMEOUT = 5.0
+
+
+def is_permanent(ex: Exception) -> bool:
+    # Errores que se repetirían igual en cada intento: datos (22), integridad (23),
+    # permisos y RLS (42) o petición inválida de PostgREST (PGRST1xx/2xx), y HTTP 4xx.
+    # Red, timeouts, 5xx y tokens caducados (PGRST3xx) se reintentan
+    code = str(getattr(ex, "code", "") or "")
+    if len(code) == 3 and code.isdigit():
+        return code.startswith("4") and code not in ("401", "408", "429")
+    return code[:2] in ("22", "23", "42") or code[:6] in ("PGRST1", "PGRST2")
+
+
+class ScoreWriter:
+    def __init__(self, path: str = SCORE_SPOOL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(spool)")}
+        if "next_at" not in columns:
+            # Colas de versiones anteriores: las filas que se descartaban tras 20 intentos
+            # quedan apartadas en lugar de perdidas
+            self._db.execute("ALTER TABLE spool ADD COLUMN next_at REAL NOT NULL DEFAULT 0")
+            self._db.execute("ALTER TABLE spool ADD COLUMN parked INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("ALTER TABLE spool ADD COLUMN error TEXT")
+            self._db.execute("UPDATE spool SET parked = 1, error = 'too many attempts' WHERE attempts >= 20")
+        self._lock = threading.Lock()
+        # _take() no reclama las filas: dos flush a la vez (el hilo de subida y el de salida)
+        # insertarían las mismas puntuaciones dos veces
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._client = None
+
+    def enqueue(self, row: dict):
+        # Queda en disco antes de volver: sobrevive a reinicios del proceso
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO spool (payload, created_at) VALUES (?, ?)",
+                (json.dumps(row), time.time()),
+            )
+        self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool WHERE parked = 0").fetchone()[0]
+
+    def parked(self) -> int:
+        # Filas que el servidor rechaza siempre: se guardan para revisarlas, nunca se borran
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM spool WHERE parked = 1").fetchone()[0]
+
+    def start(self):
+        if self._thread is None:
+            if not SUPABASE_SERVICE_ROLE_KEY:
+                raise ValueError(
+                    "SUPABASE_SERVICE_ROLE_KEY no encontrada: sin ella no se pueden subir las "
+                    "puntuaciones de usuarios que ya cerraron su sesión"
+                )
+            parked = self.parked()
+            if parked:
+                print(f"WARNING: {parked} scores parked in {SCORE_SPOOL_PATH} (rejected by the server)")
+            self._thread = threading.Thread(target=self._run, name="score-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_on_exit)
+
+    def _run(self):
+        failures = 0
+        while True:
+            try:
+                written = self.flush()
+                failures = 0
+            except Exception as ex:
+                failures += 1
+                delay = min(MAX_BACKOFF, 2 ** failures)
+                print(f"Error flushing scores (retry in {delay:.0f}s): {ex}")
+                time.sleep(delay)
+                continue
+            if not written:
+                self._wake.wait(IDLE_WAIT)
+                self._wake.clear()
+
+    def _take(self) -> List[Tuple[int, dict]]:
+        # Las filas que esperan su reintento no bloquean a las más nuevas
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload FROM spool WHERE parked = 0 AND next_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), BATCH_SIZE),
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def _get_client(self):
+        # Solo lo usan los flush, y solo cuando hay filas pendientes
+        if self._client is None:
+            self._client = create_session_client(SUPABASE_SERVICE_ROLE_KEY)
+        return self._client
+
+    def _update(self, sql: str, ids: List[int], *params):
+        with self._lock:
+            self._db.execute(f"{sql} WHERE id IN ({','.join('?' * len(ids))})", (*params, *ids))
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> int:
+        batch = self._take()
+        if not batch:
+            return 0
+        # Un único insert para todo el lote: _insert aparta las filas que el servidor rechaza
+        # y aplaza el lote si el fallo es transitorio (Supabase caído: _run espera antes de seguir)
+        return self._insert(self._get_client(), batch)
+
+    def _insert(self, client, group: List[Tuple[int, dict]]) -> int:
+        ids = [row_id for row_id, _ in group]
+        try:
+            with db_call("scores.insert"):
+                client.table("scores").insert([row for _, row in group]).execute()
+        except Exception as ex:
+            if not is_permanent(ex):
+                # Transitorio: solo estas filas esperan, con backoff según sus intentos
+                self._update(
+                    f"UPDATE spool SET attempts = attempts + 1,"
+                    f" next_at = ? + MIN({MAX_BACKOFF}, 1 << MIN(attempts, 6)), error = ?",
+                    ids, time.time(), str(ex)[:500],
+                )
+                raise
+            if len(group) > 1:
+                # Un insert de varias filas falla entero: se parte para aislar la rechazada
+                half = len(group) // 2
+                return self._insert(client, group[:half]) + self._insert(client, group[half:])
+            self._update("UPDATE spool SET parked = 1, attempts = attempts + 1, error = ?", ids, str(ex)[:500])
+            metrics.scores_parked.inc()
+            print(f"Score parked (rejected by the server, kept in the spool): {group[0][1]} {ex}")
+            return 0
+        with self._lock:
+            self._db.execute(f"DELETE FROM spool WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return len(ids)
+
+    def _flush_on_exit(self):
+        deadline = time.monotonic() + EXIT_FLUSH_TIMEOUT
+        # Espera a que el hilo de subida termine su lote y lo deja sin turno hasta salir
+        if not self._flush_lock.acquire(timeout=EXIT_FLUSH_TIMEOUT):
+            print(f"Scores left in spool at exit: writer busy for {EXIT_FLUSH_TIMEOUT:.0f}s")
+            return
+        try:
+            while time.monotonic() < deadline and self._flush():
+                pass
+        except Exception as ex:
+            print(f"Scores left in spool at exit: {ex}")
+        finally:
+            self._flush_lock.release()
+
+
+score_writer = ScoreWriter()
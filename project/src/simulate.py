@@ -0,0 +1,125 @@
+"""Simulación headless de partidas de TetrisGame.
+
+Uso: python -m simulate --games 1000 --seed 0 --policy random --out results.jsonl
+                         [--max-ticks 100000] [--max-pieces N]
+
+Cada partida usa la semilla seed + i, así que el resultado (salvo el tiempo de
+pared) es determinista. Una partida termina al perder o al llegar a --max-ticks
+ticks o --max-pieces piezas; el bot casi nunca pierde, así que por defecto se
+corta a las MAX_PIECES[policy] piezas. Las partidas se reparten entre todos los núcleos con un
+ProcessPoolExecutor y los resultados se escriben en orden, una línea JSON por
+partida, a medida que terminan.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+from tetris_game import TetrisGame, INPUTS
+from bot import BotPolicy
+
+
+class DropPolicy:
+    # Deja caer cada pieza donde aparece
+    def __init__(self, seed: int):
+        pass
+
+    def __call__(self, game: TetrisGame) -> Iterable[str]:
+        return ('drop',)
+
+
+class RandomPolicy:
+    # Entre 0 y 2 entradas aleatorias por tick, con su propio generador
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+
+    def __call__(self, game: TetrisGame) -> Iterable[str]:
+        return self.rng.choices(INPUTS, weights=(4, 4, 3, 2, 1), k=self.rng.randrange(3))
+
+
+POLICIES = {
+    'drop': DropPolicy,
+    'random': RandomPolicy,
+    # Coloca cada pieza entera en un tick con la búsqueda de bot.py
+    'bot': BotPolicy,
+}
+
+# Piezas por partida de cada política si no se indica --max-pieces (como `python -m bot`)
+MAX_PIECES = {
+    'bot': 2000,
+}
+
+
+def run_game(seed: int, policy_name: str = 'random', max_ticks: int = 100000, max_pieces: Optional[int] = None) -> dict:
+    start = time.perf_counter()
+    game = TetrisGame(seed)
+    policy = POLICIES[policy_name](seed)
+    if max_pieces is None:
+        max_pieces = MAX_PIECES.get(policy_name, max_ticks)
+    ticks = 0
+    while not game.game_over and ticks < max_ticks and game.pieces < max_pieces:
+        for action in policy(game):
+            game.apply_input(action)
+            if game.game_over:
+                break
+        else:
+            game.drop_piece()
+        ticks += 1
+
+    return {
+        'seed': seed,
+        'policy': policy_name,
+        'score': game.score,
+        'level': game.level,
+        'lines': game.lines_cleared,
+        'pieces': game.pieces,
+        'ticks': ticks,
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def _run_job(job) -> dict:
+    return run_game(*job)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulación headless de partidas de Tetris")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--max-ticks', type=int, default=100000)
+    parser.add_argument('--max-pieces', type=int, help="por defecto, MAX_PIECES de la política o sin límite")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='-')
+    args = parser.parse_args(argv)
+
+    jobs = [(args.seed + i, args.policy, args.max_ticks, args.max_pieces) for i in range(args.games)]
+    chunksize = max(1, args.games // (args.workers * 8))
+    out = sys.stdout if args.out == '-' else open(args.out, 'w')
+    start = time.perf_counter()
+    pieces = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for result in executor.map(_run_job, jobs, chunksize=chunksize):
+                pieces += result['pieces']
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.games} partidas en {elapsed:.2f} s: "
+        f"{args.games / elapsed:.1f} partidas/s, {pieces / elapsed:.0f} piezas/s "
+        f"({args.workers} procesos)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == '__main__':
+    main()
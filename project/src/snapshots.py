@@ -0,0 +1,242 @@
+import atexit
+import os
+import sqlite3
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from tetris_game import TetrisGame
+
+if TYPE_CHECKING:
+    from replay import ReplayRecorder
+
+# Partidas en curso guardadas fuera del proceso para retomarlas tras un auto-stop de
+# Fly, un despliegue o al entrar desde otra máquina: "sqlite" (por defecto), "file" o "none"
+SNAPSHOT_STORE = os.getenv("SNAPSHOT_STORE", "sqlite")
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+# Fichero SQLite o directorio de ficheros, según el almacén
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+# Segundos entre instantáneas de una partida en marcha; también se guarda al pausar o desconectarse
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", 10))
+# Las partidas que nadie retoma en este tiempo se borran al arrancar
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", 7 * 86400))
+MAX_BACKOFF = 30.0
+EXIT_FLUSH_TIMEOUT = 5.0
+
+# Registro de sesión: longitud de la instantánea de la partida (u16) | partida | replay en curso
+SESSION_LENGTH = struct.Struct('<H')
+
+
+def encode_session(game: TetrisGame, replay: "ReplayRecorder") -> bytes:
+    game_data = game.snapshot()
+    return b''.join((SESSION_LENGTH.pack(len(game_data)), game_data, replay.snapshot()))
+
+
+def decode_session(data: bytes) -> Tuple[TetrisGame, "ReplayRecorder"]:
+    from replay import ReplayRecorder
+
+    start = SESSION_LENGTH.size
+    if len(data) < start:
+        raise ValueError("Instantánea truncada")
+    (length,) = SESSION_LENGTH.unpack_from(data)
+    game = TetrisGame.from_snapshot(data[start:start + length])
+    replay = ReplayRecorder.from_snapshot(data[start + length:])
+    if replay.seed != game.seed:
+        raise ValueError("El replay no corresponde a la partida")
+    return game, replay
+
+
+class NullSnapshotStore:
+    def load(self, key: str) -> Optional[bytes]:
+        return None
+
+    def save_many(self, items: Dict[str, Optional[bytes]]):
+        pass
+
+    def purge(self, max_age: float):
+        pass
+
+
+class SQLiteSnapshotStore:
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Perder la última instantánea en un corte de luz es aceptable; un fsync por lote no
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            " key TEXT PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def load(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM snapshots WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, items: Dict[str, Optional[bytes]]):
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO snapshots (key, data, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                    [(key, data, now) for key, data in items.items() if data is not None],
+                )
+                self._db.executemany(
+                    "DELETE FROM snapshots WHERE key = ?",
+                    [(key,) for key, data in items.items() if data is None],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def purge(self, max_age: float):
+        with self._lock:
+            self._db.execute("DELETE FROM snapshots WHERE updated_at < ?", (time.time() - max_age,))
+
+
+class FileSnapshotStore:
+    # Un fichero por usuario; se escribe en uno temporal y se renombra, así nunca queda a medias
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        name = "".join(c for c in key if c.isalnum() or c == "-")
+        return os.path.join(self.path, f"{name}.snap")
+
+    def load(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._file(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save_many(self, items: Dict[str, Optional[bytes]]):
+        for key, data in items.items():
+            path = self._file(key)
+            if data is None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+    def purge(self, max_age: float):
+        limit = time.time() - max_age
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".snap") and entry.stat().st_mtime < limit:
+                os.remove(entry.path)
+
+
+STORES = {
+    "sqlite": (SQLiteSnapshotStore, os.path.join(DATA_DIR, "snapshots.db")),
+    "file": (FileSnapshotStore, os.path.join(DATA_DIR, "snapshots")),
+    "none": (lambda path: NullSnapshotStore(), None),
+}
+
+
+def create_store(name: str = SNAPSHOT_STORE, path: Optional[str] = SNAPSHOT_PATH):
+    if name not in STORES:
+        raise ValueError(f"Almacén de instantáneas desconocido: {name}")
+    factory, default_path = STORES[name]
+    return factory(path or default_path)
+
+
+class SnapshotWriter:
+    # Las sesiones solo dejan la última instantánea de cada usuario en memoria;
+    # un hilo las escribe por lotes para que el disco nunca frene el bucle de eventos
+    def __init__(self, store):
+        self.store = store
+        self._pending: Dict[str, Optional[bytes]] = {}
+        # Lote que se está escribiendo: load() no debe leer una versión anterior del almacén
+        self._writing: Dict[str, Optional[bytes]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.written = 0
+
+    def save(self, key: str, data: bytes):
+        with self._lock:
+            self._pending[key] = data
+        self._wake.set()
+
+    def discard(self, key: str):
+        with self._lock:
+            self._pending[key] = None
+        self._wake.set()
+
+    def load(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
+            if key in self._writing:
+                return self._writing[key]
+        return self.store.load(key)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_on_exit)
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._writing = batch
+        if not batch:
+            return 0
+        try:
+            self.store.save_many(batch)
+        except Exception:
+            # Se devuelven a la cola salvo las que ya tienen una versión más nueva
+            with self._lock:
+                for key, data in batch.items():
+                    self._pending.setdefault(key, data)
+                self._writing = {}
+            raise
+        with self._lock:
+            self._writing = {}
+        self.written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        try:
+            self.store.purge(SNAPSHOT_TTL)
+        except Exception as ex:
+            print(f"Error purging snapshots: {ex}")
+        failures = 0
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.flush()
+                failures = 0
+            except Exception as ex:
+                failures += 1
+                delay = min(MAX_BACKOFF, 2 ** failures)
+                print(f"Error writing snapshots (retry in {delay:.0f}s): {ex}")
+                time.sleep(delay)
+                self._wake.set()
+
+    def _flush_on_exit(self):
+        deadline = time.monotonic() + EXIT_FLUSH_TIMEOUT
+        try:
+            while time.monotonic() < deadline and self.flush():
+                pass
+        except Exception as ex:
+            print(f"Snapshots lost at exit: {ex}")
+
+
+snapshot_writer = SnapshotWriter(create_store())
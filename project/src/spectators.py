@@ -0,0 +1,170 @@
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from scheduler import scheduler
+from tetris_game import TetrisGame, BOARD_WIDTH, BOARD_HEIGHT
+
+BOARD_CELLS = BOARD_WIDTH * BOARD_HEIGHT
+
+
+class Delta:
+    __slots__ = ('seq', 'cells', 'score', 'level', 'lines', 'over')
+
+    def __init__(self, seq: int, cells: Tuple[Tuple[int, int], ...], score: int, level: int, lines: int, over: bool):
+        # Un delta por tick del jugador, compartido por todos sus espectadores:
+        # pares (celda, id de PALETTE) que cambiaron, pieza y fantasma incluidos
+        self.seq = seq
+        self.cells = cells
+        self.score = score
+        self.level = level
+        self.lines = lines
+        self.over = over
+
+
+class Viewer:
+    __slots__ = ('channel', 'timer', 'cells', 'state', 'connected')
+
+    def __init__(self, channel: "Channel", flush: Callable[[], None]):
+        self.channel = channel
+        self.timer = scheduler.frame_timer(flush)
+        # Hueco único: los deltas que llegan antes de enviar el anterior se fusionan en él,
+        # así que un espectador lento o desconectado nunca acumula más de un tablero
+        self.cells: Dict[int, int] = {}
+        self.state: Optional[Delta] = None
+        self.connected = True
+
+    def push(self, delta: Delta) -> bool:
+        dropped = self.state is not None
+        self.cells.update(delta.cells)
+        self.state = delta
+        if self.connected and not dropped:
+            scheduler.request_frame(self.timer)
+        return dropped
+
+
+class Channel:
+    __slots__ = ('id', 'username', 'game', 'frame', 'scratch', 'viewers', 'seq', 'closed')
+
+    def __init__(self, channel_id: int, username: str, game: TetrisGame):
+        self.id = channel_id
+        self.username = username
+        self.game = game
+        # Último frame publicado: los deltas se calculan contra él una sola vez por tick
+        self.frame = bytearray(BOARD_CELLS)
+        self.scratch = bytearray(BOARD_CELLS)
+        self.viewers: List[Viewer] = []
+        self.seq = 0
+        self.closed = False
+
+    def delta(self, full: bool = False) -> Delta:
+        game = self.game
+        frame, scratch = self.frame, self.scratch
+        game.draw_frame(scratch, True)
+        if full:
+            cells = tuple(enumerate(scratch))
+        elif scratch == frame:
+            cells = ()
+        else:
+            cells = tuple((i, scratch[i]) for i in range(BOARD_CELLS) if scratch[i] != frame[i])
+        frame[:] = scratch
+        self.seq += 1
+        return Delta(self.seq, cells, game.score, game.level, game.lines_cleared, game.game_over)
+
+
+class SpectatorHub:
+    def __init__(self):
+        self._channels: Dict[int, Channel] = {}
+        # Los jugadores publican desde el planificador y los espectadores entran y salen
+        # desde sus manejadores: todo el estado compartido cambia bajo este cerrojo
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.deltas = 0
+        self.deliveries = 0
+        self.dropped = 0
+
+    def open(self, username: str, game: TetrisGame) -> Channel:
+        channel = Channel(next(self._ids), username, game)
+        with self._lock:
+            self._channels[channel.id] = channel
+        return channel
+
+    def close(self, channel: Channel):
+        with self._lock:
+            if self._channels.pop(channel.id, None) is None:
+                return
+            channel.closed = True
+            if channel.viewers:
+                self._fan_out(channel.viewers, channel.delta())
+
+    def publish(self, channel: Channel):
+        # Sin espectadores no cuesta nada: el frame se calcula al llegar el primero
+        with self._lock:
+            if channel.viewers and not channel.closed:
+                delta = channel.delta()
+                # Puntos, nivel y líneas solo cambian al fijar una pieza, que también cambia celdas
+                if delta.cells:
+                    self._fan_out(channel.viewers, delta)
+
+    def _fan_out(self, viewers: List[Viewer], delta: Delta):
+        self.deltas += 1
+        self.deliveries += len(viewers)
+        for viewer in viewers:
+            if viewer.push(delta):
+                self.dropped += 1
+
+    def watch(self, channel: Channel, flush: Callable[[], None]) -> Optional[Viewer]:
+        # El primer envío es el tablero completo; después, solo deltas
+        with self._lock:
+            if channel.closed:
+                return None
+            viewers = list(channel.viewers)
+            viewer = Viewer(channel, flush)
+            channel.viewers.append(viewer)
+            # Sin espectadores previos el frame publicado está desfasado: se recalcula entero
+            delta = channel.delta(not viewers)
+            if viewers:
+                if delta.cells:
+                    self._fan_out(viewers, delta)
+                delta = Delta(
+                    delta.seq, tuple(enumerate(channel.frame)), delta.score, delta.level, delta.lines, delta.over,
+                )
+            viewer.push(delta)
+        return viewer
+
+    def take(self, viewer: Viewer) -> Tuple[Dict[int, int], Optional[Delta]]:
+        # Vacía el hueco del espectador: celdas fusionadas y estado más reciente
+        with self._lock:
+            cells, state = viewer.cells, viewer.state
+            viewer.cells = {}
+            viewer.state = None
+        return cells, state
+
+    def pause(self, viewer: Viewer):
+        # Sin conexión no se envía nada; el hueco sigue fusionando el estado más reciente
+        with self._lock:
+            viewer.connected = False
+
+    def resume(self, viewer: Viewer):
+        with self._lock:
+            viewer.connected = True
+            pending = viewer.state is not None
+        if pending:
+            scheduler.request_frame(viewer.timer)
+
+    def leave(self, viewer: Viewer):
+        viewer.timer.cancel()
+        with self._lock:
+            if viewer in viewer.channel.viewers:
+                viewer.channel.viewers.remove(viewer)
+
+    def live(self) -> List[Channel]:
+        with self._lock:
+            return list(self._channels.values())
+
+    def viewers(self) -> int:
+        with self._lock:
+            return sum(len(channel.viewers) for channel in self._channels.values())
+
+
+spectator_hub = SpectatorHub()
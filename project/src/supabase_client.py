@@ -1,7 +1,19 @@
+import asyncio
 import os
-from supabase import create_client, Client
+import ssl
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+import metrics
+from metrics import db_call
+
+if TYPE_CHECKING:
+    import httpx
+    from supabase import Client
+
 load_dotenv()
 
 SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
@@ -10,4 +22,132 @@ SUPABASE_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise ValueError("Variables de entorno de Supabase no encontradas")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Las llamadas HTTP de Supabase son síncronas: se ejecutan en un pool acotado
+# para no bloquear el bucle de eventos que mueve todas las sesiones
+SUPABASE_WORKERS = int(os.getenv("SUPABASE_WORKERS", 8))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", 10))
+# Pool HTTP compartido por todos los clientes: conexiones keep-alive reutilizadas
+# entre sesiones en lugar de un handshake TLS por sesión y servicio
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", 20))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", 10))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", 60))
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "1") != "0"
+# CA adicional en la que confiar (Supabase autoalojado con certificado propio)
+SUPABASE_CA_FILE = os.getenv("SUPABASE_CA_FILE")
+
+
+class CountingSSLContext(ssl.SSLContext):
+    # Cada wrap_socket es una conexión TLS nueva: con el pool solo crece al abrir conexiones
+    handshakes = 0
+
+    def wrap_socket(self, *args, **kwargs):
+        self.handshakes += 1
+        return super().wrap_socket(*args, **kwargs)
+
+
+tls_context = None
+_http = None
+# Importar el SDK de Supabase cuesta más de medio segundo: el cliente se crea con la
+# primera consulta (normalmente el calentamiento en segundo plano), no al arrancar
+_client = None
+_client_lock = threading.Lock()
+_http_lock = threading.Lock()
+# Un refresco a la vez por cliente: el refresh token es de un solo uso y una sesión
+# puede tener varias consultas en curso en el pool
+_refresh_locks = weakref.WeakKeyDictionary()
+_refresh_locks_lock = threading.Lock()
+
+metrics.CounterFunc(
+    "tetris_db_tls_handshakes_total", "Conexiones TLS abiertas hacia Supabase",
+    lambda: tls_context.handshakes if tls_context else 0,
+)
+
+
+def get_http_client() -> "httpx.Client":
+    global _http, tls_context
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                import certifi
+                import httpx
+
+                context = CountingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+                context.load_verify_locations(certifi.where())
+                if SUPABASE_CA_FILE:
+                    context.load_verify_locations(SUPABASE_CA_FILE)
+                tls_context = context
+                # Las cabeceras (y el token) van en cada petición, no en el cliente HTTP
+                _http = httpx.Client(
+                    verify=context,
+                    http2=SUPABASE_HTTP2,
+                    timeout=SUPABASE_TIMEOUT,
+                    follow_redirects=True,
+                    limits=httpx.Limits(
+                        max_connections=SUPABASE_MAX_CONNECTIONS,
+                        max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+                    ),
+                )
+    return _http
+
+
+def _options():
+    from supabase import ClientOptions
+
+    # Sin hilo de refresco por sesión: refresh_session() renueva el token antes de cada consulta
+    # de la sesión (run_session_db) cuando está a punto de caducar
+    return ClientOptions(httpx_client=get_http_client(), auto_refresh_token=False, persist_session=False)
+
+
+def get_client() -> "Client":
+    # Cliente anónimo compartido: nunca inicia sesión, así que RLS solo le deja leer las
+    # preguntas; el ranking y las puntuaciones van con el cliente de cada sesión
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from supabase import create_client
+
+                _client = create_client(SUPABASE_URL, SUPABASE_KEY, _options())
+    return _client
+
+
+def create_session_client(key: str = SUPABASE_KEY) -> "Client":
+    # Un cliente por sesión con su propio estado de auth sobre el pool compartido (~5 KB, ~0.1 ms)
+    from supabase import create_client
+
+    return create_client(SUPABASE_URL, key, _options())
+
+
+def refresh_session(client: "Client"):
+    # get_session() renueva el token si está a punto de caducar; sin sesión no hace nada
+    with _refresh_locks_lock:
+        lock = _refresh_locks.get(client)
+        if lock is None:
+            lock = _refresh_locks[client] = threading.Lock()
+    with lock:
+        client.auth.get_session()
+
+
+_executor = ThreadPoolExecutor(max_workers=SUPABASE_WORKERS, thread_name_prefix="supabase")
+
+
+async def run_db(fn, *args, timeout: float = SUPABASE_TIMEOUT, op: str = None):
+    # op etiqueta la latencia y los errores (incluidos los timeouts) en las métricas;
+    # sin op la función ya mide sus propias consultas
+    loop = asyncio.get_running_loop()
+    if op is None:
+        return await asyncio.wait_for(loop.run_in_executor(_executor, fn, *args), timeout)
+    with db_call(op):
+        return await asyncio.wait_for(loop.run_in_executor(_executor, fn, *args), timeout)
+
+
+def _with_session(client: "Client", fn, *args):
+    refresh_session(client)
+    return fn(*args)
+
+
+async def run_session_db(client: "Client", fn, *args, timeout: float = SUPABASE_TIMEOUT, op: str = None):
+    # Como run_db, para consultas con el token de la sesión: sin refresco automático,
+    # el JWT del login caducaría (~1 h) y RLS rechazaría el ranking y el perfil
+    return await run_db(_with_session, client, fn, *args, timeout=timeout, op=op)
@@ -1,5 +1,6 @@
 import random
-from typing import List, Tuple
+import struct
+from typing import List, NamedTuple, Optional, Tuple
 
 BOARD_WIDTH = 10
 BOARD_HEIGHT = 20
@@ -25,35 +26,254 @@ COLORS = {
     'L': '#f0a000'
 }
 
+# Cada fila del tablero es un entero: el bit x indica que la columna x está ocupada
+FULL_ROW = (1 << BOARD_WIDTH) - 1
+
+# Bloques vacíos preasignados para rellenar la parte superior al limpiar líneas
+EMPTY_ROWS = [[0] * n for n in range(5)]
+EMPTY_COLORS = [bytes(n * BOARD_WIDTH) for n in range(5)]
+
+LINE_POINTS = {1: 100, 2: 300, 3: 500, 4: 800}
+
+MASK64 = (1 << 64) - 1
+
+INPUTS = ('left', 'right', 'rotate', 'down', 'drop')
+
+# Plano de colores compacto: 0 = vacío, 1..7 = índice del tipo de pieza
+SHAPE_TYPES = list(SHAPES.keys())
+COLOR_IDS = {shape_type: i + 1 for i, shape_type in enumerate(SHAPE_TYPES)}
+PALETTE = [None] + [COLORS[shape_type] for shape_type in SHAPE_TYPES]
+
+# Color de la pieza fantasma; nunca se guarda en el tablero
+GHOST_COLOR = '#3a3a3a'
+GHOST_COLOR_ID = len(PALETTE)
+PALETTE.append(GHOST_COLOR)
+# Colocación sugerida por bot.py en modo pista; tampoco se guarda en el tablero
+HINT_COLOR = '#1b5e20'
+HINT_COLOR_ID = len(PALETTE)
+PALETTE.append(HINT_COLOR)
+
+# Instantánea binaria de una partida (versión 1), little-endian:
+#   b'TGS' | versión | semilla, estado del RNG (u64) | puntuación, nivel, líneas, piezas |
+#   game_over | pieza actual: tipo, rotación, x, y | tipo de la siguiente | primera fila ocupada |
+#   filas ocupadas (u16 cada una) | colores de esas filas (1 byte por celda)
+# Las filas vacías de arriba no se guardan: de 41 bytes (tablero vacío) a 281 (lleno)
+SNAPSHOT_MAGIC = b'TGS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<3sBQQIHIIBBBbbBB')
+ROW_FORMATS = [struct.Struct(f'<{n}H') for n in range(BOARD_HEIGHT + 1)]
+
+
+def _rotation_states(shape: List[List[int]]) -> List[List[List[int]]]:
+    states = []
+    for _ in range(4):
+        states.append(shape)
+        shape = [list(row) for row in zip(*shape[::-1])]
+    return states
+
+
+class RotationState(NamedTuple):
+    shape: Tuple[Tuple[int, ...], ...]
+    cells: Tuple[Tuple[int, int], ...]
+    masks: Tuple[int, ...]
+    width: int
+    bottom: Tuple[int, ...]
+
+
+# Las 4 rotaciones de cada pieza se calculan una sola vez al importar
+ROTATIONS = {
+    shape_type: tuple(
+        RotationState(
+            shape=tuple(tuple(row) for row in state),
+            cells=tuple(
+                (x, y) for y, row in enumerate(state) for x, cell in enumerate(row) if cell
+            ),
+            masks=tuple(
+                sum(1 << x for x, cell in enumerate(row) if cell) for row in state
+            ),
+            width=len(state[0]),
+            # Fila más baja ocupada de cada columna de la pieza
+            bottom=tuple(
+                max(y for y, row in enumerate(state) if row[x]) for x in range(len(state[0]))
+            ),
+        )
+        for state in _rotation_states(shape)
+    )
+    for shape_type, shape in SHAPES.items()
+}
+
 
 class Piece:
+    __slots__ = ('type', 'rotation', 'x', 'y')
+
     def __init__(self, shape_type: str):
         self.type = shape_type
-        self.shape = SHAPES[shape_type]
-        self.color = COLORS[shape_type]
-        self.x = BOARD_WIDTH // 2 - len(self.shape[0]) // 2
+        self.rotation = 0
+        self.x = BOARD_WIDTH // 2 - ROTATIONS[shape_type][0].width // 2
         self.y = 0
 
+    @property
+    def shape(self) -> Tuple[Tuple[int, ...], ...]:
+        return ROTATIONS[self.type][self.rotation].shape
+
+    @property
+    def color(self) -> str:
+        return COLORS[self.type]
+
+    @property
+    def width(self) -> int:
+        return ROTATIONS[self.type][self.rotation].width
+
+    @property
+    def cells(self) -> Tuple[Tuple[int, int], ...]:
+        # Desplazamientos relativos a (x, y); no crea objetos nuevos
+        return ROTATIONS[self.type][self.rotation].cells
+
     def rotate(self):
-        self.shape = [list(row) for row in zip(*self.shape[::-1])]
+        self.rotation = (self.rotation + 1) & 3
+
+    def row_masks(self) -> Tuple[int, ...]:
+        return ROTATIONS[self.type][self.rotation].masks
 
     def get_cells(self) -> List[Tuple[int, int]]:
-        cells = []
-        for y, row in enumerate(self.shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    cells.append((self.x + x, self.y + y))
-        return cells
+        return [(self.x + dx, self.y + dy) for dx, dy in self.cells]
 
 
-class TetrisGame:
+class PieceRandom:
+    # splitmix64: estado de 64 bits, determinista para una semilla dada
+    __slots__ = ('state',)
+
+    def __init__(self, seed: int):
+        self.state = seed & MASK64
+
+    def next_type(self) -> str:
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        z ^= z >> 31
+        return SHAPE_TYPES[((z >> 32) * len(SHAPE_TYPES)) >> 32]
+
+
+class BitBoard:
+    __slots__ = ('rows', 'colors', 'heights')
+
     def __init__(self):
-        self.board = [[None for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+        self.rows = [0] * BOARD_HEIGHT
+        self.colors = bytearray(BOARD_WIDTH * BOARD_HEIGHT)
+        # Altura de cada columna: BOARD_HEIGHT menos la fila de su celda más alta
+        self.heights = [0] * BOARD_WIDTH
+
+    def reset(self):
+        self.rows[:] = [0] * BOARD_HEIGHT
+        self.colors[:] = bytes(BOARD_WIDTH * BOARD_HEIGHT)
+        self.heights[:] = [0] * BOARD_WIDTH
+
+    def collides(self, masks: Tuple[int, ...], x: int, y: int) -> bool:
+        rows = self.rows
+        for mask in masks:
+            if y >= BOARD_HEIGHT:
+                return True
+            if y >= 0 and rows[y] & (mask << x):
+                return True
+            y += 1
+        return False
+
+    def drop_distance(self, state: RotationState, x: int, y: int) -> int:
+        heights = self.heights
+        distance = BOARD_HEIGHT
+        for dx, bottom in enumerate(state.bottom):
+            d = BOARD_HEIGHT - 1 - heights[x + dx] - y - bottom
+            if d < distance:
+                distance = d
+        if distance < 0:
+            # La pieza está bajo la superficie de alguna columna (debajo de un saliente)
+            distance = 0
+            while not self.collides(state.masks, x, y + distance + 1):
+                distance += 1
+        return distance
+
+    def place(self, masks: Tuple[int, ...], x: int, y: int, color_id: int):
+        rows = self.rows
+        colors = self.colors
+        heights = self.heights
+        for mask in masks:
+            if y >= 0:
+                rows[y] |= mask << x
+                index = y * BOARD_WIDTH + x
+                height = BOARD_HEIGHT - y
+                col = x
+                while mask:
+                    if mask & 1:
+                        colors[index] = color_id
+                        if heights[col] < height:
+                            heights[col] = height
+                    mask >>= 1
+                    index += 1
+                    col += 1
+            y += 1
+
+    def is_full(self, y: int) -> bool:
+        return self.rows[y] == FULL_ROW
+
+    def full_rows(self, top: int = 0, bottom: int = BOARD_HEIGHT) -> List[int]:
+        rows = self.rows
+        return [y for y in range(max(top, 0), min(bottom, BOARD_HEIGHT)) if rows[y] == FULL_ROW]
+
+    def clear_rows(self, full: List[int]):
+        # Compacta en una pasada: cada tramo entre filas llenas baja tantas filas
+        # como filas llenas tenga debajo; las filas libres de arriba se reutilizan
+        rows = self.rows
+        colors = self.colors
+        shift = 0
+        bottom = full[-1]
+        for i in range(len(full) - 1, -1, -1):
+            shift += 1
+            top = full[i - 1] + 1 if i else 0
+            if top < bottom:
+                rows[top + shift:bottom + shift] = rows[top:bottom]
+                colors[(top + shift) * BOARD_WIDTH:(bottom + shift) * BOARD_WIDTH] = (
+                    colors[top * BOARD_WIDTH:bottom * BOARD_WIDTH]
+                )
+            bottom = top - 1
+        rows[:shift] = EMPTY_ROWS[shift]
+        colors[:shift * BOARD_WIDTH] = EMPTY_COLORS[shift]
+        self.update_heights()
+
+    def update_heights(self):
+        heights = self.heights
+        heights[:] = [0] * BOARD_WIDTH
+        pending = FULL_ROW
+        for y, row in enumerate(self.rows):
+            top = row & pending
+            while top:
+                low = top & -top
+                heights[low.bit_length() - 1] = BOARD_HEIGHT - y
+                top ^= low
+            pending &= ~row
+            if not pending:
+                break
+
+    def color_at(self, x: int, y: int) -> Optional[str]:
+        return PALETTE[self.colors[y * BOARD_WIDTH + x]]
+
+
+class TetrisGame:
+    __slots__ = (
+        'seed', 'rng', 'board', 'current_piece', 'next_piece',
+        'score', 'level', 'lines_cleared', 'pieces', 'game_over',
+    )
+
+    def __init__(self, seed: Optional[int] = None):
+        # Misma semilla efectiva que PieceRandom: cabe en la instantánea (Q) y en el varint del replay
+        self.seed = (random.getrandbits(63) if seed is None else seed) & MASK64
+        self.rng = PieceRandom(self.seed)
+        self.board = BitBoard()
         self.current_piece = None
         self.next_piece = None
         self.score = 0
         self.level = 1
         self.lines_cleared = 0
+        self.pieces = 0
         self.game_over = False
         self.spawn_piece()
         self.spawn_next_piece()
@@ -62,28 +282,20 @@ class TetrisGame:
         if self.next_piece:
             self.current_piece = self.next_piece
         else:
-            shape_type = random.choice(list(SHAPES.keys()))
-            self.current_piece = Piece(shape_type)
+            self.current_piece = Piece(self.rng.next_type())
 
         if not self.is_valid_position(self.current_piece):
             self.game_over = True
 
     def spawn_next_piece(self):
-        shape_type = random.choice(list(SHAPES.keys()))
-        self.next_piece = Piece(shape_type)
+        self.next_piece = Piece(self.rng.next_type())
 
     def is_valid_position(self, piece: Piece, offset_x: int = 0, offset_y: int = 0) -> bool:
-        for x, y in piece.get_cells():
-            new_x = x + offset_x
-            new_y = y + offset_y
-
-            if new_x < 0 or new_x >= BOARD_WIDTH or new_y >= BOARD_HEIGHT:
-                return False
-
-            if new_y >= 0 and self.board[new_y][new_x] is not None:
-                return False
-
-        return True
+        state = ROTATIONS[piece.type][piece.rotation]
+        x = piece.x + offset_x
+        if x < 0 or x + state.width > BOARD_WIDTH:
+            return False
+        return not self.board.collides(state.masks, x, piece.y + offset_y)
 
     def move_piece(self, dx: int, dy: int) -> bool:
         if self.is_valid_position(self.current_piece, dx, dy):
@@ -92,42 +304,75 @@ class TetrisGame:
             return True
         return False
 
+    def drop_distance(self, piece: Piece) -> int:
+        state = ROTATIONS[piece.type][piece.rotation]
+        return self.board.drop_distance(state, piece.x, piece.y)
+
+    def ghost_y(self) -> int:
+        return self.current_piece.y + self.drop_distance(self.current_piece)
+
     def rotate_piece(self) -> bool:
-        original_shape = self.current_piece.shape
+        original_rotation = self.current_piece.rotation
         self.current_piece.rotate()
 
         if not self.is_valid_position(self.current_piece):
-            self.current_piece.shape = original_shape
+            self.current_piece.rotation = original_rotation
             return False
         return True
 
     def lock_piece(self):
-        for x, y in self.current_piece.get_cells():
-            if y >= 0:
-                self.board[y][x] = self.current_piece.color
+        piece = self.current_piece
+        masks = piece.row_masks()
+        self.board.place(masks, piece.x, piece.y, COLOR_IDS[piece.type])
+        self.pieces += 1
 
-        self.clear_lines()
+        # Solo pueden haberse llenado las filas que ocupa la pieza
+        self.clear_lines(piece.y, piece.y + len(masks))
         self.spawn_piece()
         self.spawn_next_piece()
 
-    def clear_lines(self):
-        lines_to_clear = []
-        for y in range(BOARD_HEIGHT):
-            if all(self.board[y][x] is not None for x in range(BOARD_WIDTH)):
-                lines_to_clear.append(y)
-
-        for y in lines_to_clear:
-            del self.board[y]
-            self.board.insert(0, [None for _ in range(BOARD_WIDTH)])
+    def clear_lines(self, top: int = 0, bottom: int = BOARD_HEIGHT):
+        lines_to_clear = self.board.full_rows(top, bottom)
 
         if lines_to_clear:
+            self.board.clear_rows(lines_to_clear)
             self.lines_cleared += len(lines_to_clear)
-            points = {1: 100, 2: 300, 3: 500, 4: 800}
-            self.score += points.get(len(lines_to_clear), 100) * self.level
+            self.score += LINE_POINTS.get(len(lines_to_clear), 100) * self.level
 
             if self.lines_cleared >= self.level * 10:
                 self.level += 1
 
+    def draw_frame(self, frame: bytearray, ghost: bool = False):
+        # Copia el tablero fijo y superpone la pieza actual (ids de PALETTE)
+        frame[:] = self.board.colors
+        piece = self.current_piece
+        if piece:
+            if ghost and not self.game_over:
+                ghost_y = self.ghost_y()
+                for dx, dy in piece.cells:
+                    y = ghost_y + dy
+                    if y >= 0:
+                        frame[y * BOARD_WIDTH + piece.x + dx] = GHOST_COLOR_ID
+            color_id = COLOR_IDS[piece.type]
+            for dx, dy in piece.cells:
+                y = piece.y + dy
+                if y >= 0:
+                    frame[y * BOARD_WIDTH + piece.x + dx] = color_id
+
+    def apply_input(self, action: str) -> bool:
+        if action == 'left':
+            return self.move_piece(-1, 0)
+        if action == 'right':
+            return self.move_piece(1, 0)
+        if action == 'rotate':
+            return self.rotate_piece()
+        if action == 'down':
+            return self.move_piece(0, 1)
+        if action == 'drop':
+            self.hard_drop()
+            return True
+        raise ValueError(f"Entrada desconocida: {action}")
+
     def drop_piece(self) -> bool:
         if not self.move_piece(0, 1):
             self.lock_piece()
@@ -135,15 +380,86 @@ class TetrisGame:
         return True
 
     def hard_drop(self):
-        while self.move_piece(0, 1):
-            pass
+        self.current_piece.y += self.drop_distance(self.current_piece)
         self.lock_piece()
 
     def reset_board(self):
-        self.board = [[None for _ in range(BOARD_WIDTH)] for _ in range(BOARD_HEIGHT)]
+        self.board.reset()
         self.game_over = False
         self.spawn_piece()
         self.spawn_next_piece()
 
     def reduce_score(self):
         self.score = self.score // 2
+
+    def snapshot(self) -> bytes:
+        board = self.board
+        rows = board.rows
+        top = 0
+        while top < BOARD_HEIGHT and not rows[top]:
+            top += 1
+        piece = self.current_piece
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.seed, self.rng.state,
+            self.score, self.level, self.lines_cleared, self.pieces, self.game_over,
+            COLOR_IDS[piece.type], piece.rotation, piece.x, piece.y,
+            COLOR_IDS[self.next_piece.type], top,
+        )
+        return b''.join((
+            header,
+            ROW_FORMATS[BOARD_HEIGHT - top].pack(*rows[top:]),
+            board.colors[top * BOARD_WIDTH:],
+        ))
+
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> 'TetrisGame':
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise ValueError("Instantánea truncada")
+        if data[:3] != SNAPSHOT_MAGIC:
+            raise ValueError("No es una instantánea de Tetris")
+        if data[3] != SNAPSHOT_VERSION:
+            raise ValueError(f"Versión de instantánea no soportada: {data[3]}")
+        (
+            _, _, seed, rng_state, score, level, lines_cleared, pieces, game_over,
+            piece_id, rotation, x, y, next_id, top,
+        ) = SNAPSHOT_HEADER.unpack_from(data)
+        if top > BOARD_HEIGHT:
+            raise ValueError("Instantánea corrupta")
+        count = BOARD_HEIGHT - top
+        rows_format = ROW_FORMATS[count]
+        colors_start = SNAPSHOT_HEADER.size + rows_format.size
+        if len(data) != colors_start + count * BOARD_WIDTH:
+            raise ValueError("Instantánea truncada")
+        if not (1 <= piece_id <= len(SHAPE_TYPES) and 1 <= next_id <= len(SHAPE_TYPES)):
+            raise ValueError("Pieza desconocida en la instantánea")
+        if rotation > 3:
+            raise ValueError("Instantánea corrupta")
+        # La pieza solo baja desde y=0: fuera del tablero la instantánea no es de una partida real
+        state = ROTATIONS[SHAPE_TYPES[piece_id - 1]][rotation]
+        if x < 0 or x + state.width > BOARD_WIDTH or y < 0 or y + len(state.masks) > BOARD_HEIGHT:
+            raise ValueError("Instantánea corrupta")
+
+        # Sin pasar por __init__: no se sortean piezas nuevas
+        game = cls.__new__(cls)
+        game.seed = seed
+        game.rng = PieceRandom(rng_state)
+        game.board = board = BitBoard()
+        board.rows[top:] = rows = rows_format.unpack_from(data, SNAPSHOT_HEADER.size)
+        if any(row > FULL_ROW for row in rows):
+            raise ValueError("Instantánea corrupta")
+        board.colors[top * BOARD_WIDTH:] = data[colors_start:]
+        board.update_heights()
+        game.current_piece = piece = Piece(SHAPE_TYPES[piece_id - 1])
+        piece.rotation = rotation
+        piece.x = x
+        piece.y = y
+        game.next_piece = Piece(SHAPE_TYPES[next_id - 1])
+        game.score = score
+        game.level = level
+        game.lines_cleared = lines_cleared
+        game.pieces = pieces
+        game.game_over = bool(game_over)
+        # Al perder, la pieza nueva ya choca con el tablero; en juego nunca puede solaparse
+        if not game.game_over and not game.is_valid_position(piece):
+            raise ValueError("Instantánea corrupta")
+        return game
@@ -0,0 +1,7 @@
+-- =====================================================
+-- REPLAYS DE PARTIDAS
+-- =====================================================
+-- Replay binario (semilla + eventos varint) codificado en base64.
+-- Permite re-simular la partida en el servidor y verificar la puntuación
+-- con: python -m replay verify --from-db
+ALTER TABLE scores ADD COLUMN IF NOT EXISTS replay text;
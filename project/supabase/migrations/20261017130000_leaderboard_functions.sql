@@ -0,0 +1,110 @@
+-- =====================================================
+-- ÍNDICE CUBRIENTE PARA LAS PARTIDAS DE CADA USUARIO
+-- =====================================================
+-- Cubre user_top_scores: filtro por user_id, orden por score y created_at,
+-- y level incluido para no tener que leer la tabla
+CREATE INDEX IF NOT EXISTS idx_scores_user_score
+ON scores(user_id, score DESC, created_at DESC) INCLUDE (level);
+
+-- =====================================================
+-- TABLA USER_BEST_SCORES (mantenida por trigger)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS user_best_scores (
+  user_id uuid PRIMARY KEY,
+  best_score integer NOT NULL,
+  level integer NOT NULL,
+  achieved_at timestamptz NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_best_scores_rank
+ON user_best_scores(best_score DESC, achieved_at ASC);
+
+ALTER TABLE user_best_scores ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Read best scores"
+ON user_best_scores FOR SELECT
+TO authenticated
+USING (true);
+
+CREATE OR REPLACE FUNCTION update_user_best_score()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  INSERT INTO user_best_scores (user_id, best_score, level, achieved_at)
+  VALUES (NEW.user_id, NEW.score, NEW.level, COALESCE(NEW.created_at, now()))
+  ON CONFLICT (user_id) DO UPDATE
+    SET best_score = EXCLUDED.best_score,
+        level = EXCLUDED.level,
+        achieved_at = EXCLUDED.achieved_at
+    WHERE EXCLUDED.best_score > user_best_scores.best_score;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_scores_user_best ON scores;
+CREATE TRIGGER trg_scores_user_best
+AFTER INSERT ON scores
+FOR EACH ROW EXECUTE FUNCTION update_user_best_score();
+
+-- Carga inicial con las partidas ya existentes
+INSERT INTO user_best_scores (user_id, best_score, level, achieved_at)
+SELECT DISTINCT ON (user_id) user_id, score, level, COALESCE(created_at, now())
+FROM scores
+ORDER BY user_id, score DESC, created_at ASC
+ON CONFLICT (user_id) DO NOTHING;
+
+-- =====================================================
+-- FUNCIONES RPC DEL RANKING
+-- =====================================================
+-- Mejores partidas de un usuario, con paginación por clave (score, created_at)
+CREATE OR REPLACE FUNCTION user_top_scores(
+  p_user_id uuid,
+  p_limit integer DEFAULT 10,
+  p_after_score integer DEFAULT NULL,
+  p_after_created_at timestamptz DEFAULT NULL
+)
+RETURNS TABLE (score integer, level integer, created_at timestamptz)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT s.score, s.level, s.created_at
+  FROM scores s
+  WHERE s.user_id = p_user_id
+    AND (
+      p_after_score IS NULL
+      OR (s.score, s.created_at) < (p_after_score, p_after_created_at)
+    )
+  ORDER BY s.score DESC, s.created_at DESC
+  LIMIT p_limit;
+$$;
+
+-- Top global: la mejor partida de cada usuario
+CREATE OR REPLACE FUNCTION global_top_scores(p_limit integer DEFAULT 10)
+RETURNS TABLE (user_id uuid, username text, score integer, level integer, created_at timestamptz)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT b.user_id, p.username, b.best_score, b.level, b.achieved_at
+  FROM user_best_scores b
+  LEFT JOIN profiles p ON p.id = b.user_id
+  ORDER BY b.best_score DESC, b.achieved_at ASC
+  LIMIT p_limit;
+$$;
+
+-- Posición global de una puntuación entre las mejores de cada usuario
+CREATE OR REPLACE FUNCTION score_rank(p_score integer)
+RETURNS bigint
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT count(*) + 1
+  FROM user_best_scores
+  WHERE best_score > p_score;
+$$;
+
+GRANT EXECUTE ON FUNCTION user_top_scores(uuid, integer, integer, timestamptz) TO authenticated;
+GRANT EXECUTE ON FUNCTION global_top_scores(integer) TO authenticated;
+GRANT EXECUTE ON FUNCTION score_rank(integer) TO authenticated;
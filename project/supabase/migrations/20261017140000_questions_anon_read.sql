@@ -0,0 +1,9 @@
+-- =====================================================
+-- LECTURA ANÓNIMA DE PREGUNTAS
+-- =====================================================
+-- La caché de preguntas del servidor (src/questions.py) se carga en segundo
+-- plano antes de que nadie inicie sesión, con la clave anónima
+CREATE POLICY "Read questions (anon)"
+ON questions FOR SELECT
+TO anon
+USING (true);